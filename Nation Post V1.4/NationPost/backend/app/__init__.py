@@ -1,30 +1,72 @@
+import importlib
+import logging
+import os
+import time
 from flask import Flask
 from flask_cors import CORS
+from app import metrics, upload_stream
+
+# Blueprints, as (module, attribute). Route modules are imported inside create_app
+# so each one can be timed; heavy SDKs (Gemini, feedparser, BeautifulSoup, pymongo)
+# and the blockchain load are deferred further, to the first request that uses them.
+BLUEPRINTS = [
+    ("app.routes.login", "login_bp"),
+    ("app.routes.signup", "signup_bp"),
+    ("app.routes.upload", "upload_bp"),
+    ("app.routes.user_profile", "user_profile_bp"),
+    ("app.routes.verify_news", "verify_news_bp"),
+    ("app.routes.blockchain", "blockchain_bp"),
+    ("app.routes.dashboard", "dashboard_bp"),
+    ("app.routes.media", "media_bp"),
+]
 
-# Import Blueprints
-from app.routes.login import login_bp
-from app.routes.signup import signup_bp
-from app.routes.upload import upload_bp
-from app.routes.user_profile import user_profile_bp
-from app.routes.verify_news import verify_news_bp
-from app.routes.blockchain import blockchain_bp
-from app.routes.dashboard import dashboard_bp
 
 def create_app():
+    started = time.perf_counter()
+    # Debug output is opt-in (LOG_LEVEL=DEBUG); production keeps warnings and errors only
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
     app = Flask(__name__)
     CORS(app)
+    metrics.init_app(app)
+    upload_stream.init_app(app)
+
+    # Register Blueprints, recording how long each route module took to import
+    import_times = {}
+    for module_name, attr in BLUEPRINTS:
+        t0 = time.perf_counter()
+        module = importlib.import_module(module_name)
+        import_times[module_name] = round((time.perf_counter() - t0) * 1000, 2)
+        app.register_blueprint(getattr(module, attr))
 
-    # Register Blueprints
-    app.register_blueprint(login_bp)
-    app.register_blueprint(signup_bp)
-    app.register_blueprint(upload_bp)
-    app.register_blueprint(user_profile_bp)
-    app.register_blueprint(verify_news_bp)
-    app.register_blueprint(blockchain_bp)
-    app.register_blueprint(dashboard_bp)
+    app.config["STARTUP_REPORT"] = {
+        "imports_ms": import_times,
+        "create_app_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+    logging.getLogger(__name__).info(
+        "create_app took %s ms (slowest import: %s)",
+        app.config["STARTUP_REPORT"]["create_app_ms"], max(import_times, key=import_times.get)
+    )
+
+    # Pull metadata and thumbnails of new (and the newest existing) articles into the
+    # local caches in the background; CACHE_WARMING=0 turns it off
+    if os.getenv("CACHE_WARMING", "1") != "0":
+        from app.cache_warmer import start_warmer
+        start_warmer()
+    # Load the article search index and index anything mined since it was saved;
+    # SEARCH_INDEXING=0 defers that to the first search
+    from app import search_index
+    if search_index.SEARCH_INDEXING:
+        search_index.start_search_indexer()
 
     @app.route("/")
     def home():
         return {"message": "Backend is running successfully"}
 
+    @app.route("/startup")
+    def startup_report():
+        return app.config["STARTUP_REPORT"]
+
     return app
@@ -0,0 +1,173 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import requests
+
+# ---------------------------
+# Shared event loop for outbound I/O
+# ---------------------------
+# Network calls that fan out (gateway fetches for a page of cards, several Pinata
+# pins for one upload) run as coroutines on one background event loop, through one
+# shared HTTP client, while the calling view waits for the combined result. With
+# httpx installed every request in flight is a coroutine on that loop (up to
+# AIO_MAX_CONNECTIONS); without it the same coroutines hand each call to a pool of
+# AIO_IO_THREADS threads running requests.
+#
+# ASYNC_MODE=1 (set by asgi.py) additionally moves CPU-bound work off the serving
+# threads: proof-of-work to a process pool, so it doesn't hold the GIL the event
+# loop needs, and bcrypt to a pool of AIO_CPU_WORKERS threads, so a burst of logins
+# can't oversubscribe the CPUs.
+ASYNC_MODE = os.getenv("ASYNC_MODE", "0") == "1"
+AIO_MAX_CONNECTIONS = int(os.getenv("AIO_MAX_CONNECTIONS", "1000"))
+AIO_IO_THREADS = int(os.getenv("AIO_IO_THREADS", "64"))
+AIO_CPU_WORKERS = int(os.getenv("AIO_CPU_WORKERS", str(os.cpu_count() or 2)))
+
+try:
+    import httpx
+except ImportError:  # optional; requests in a thread pool is used instead
+    httpx = None
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """The shared event loop, running in a daemon thread."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="aio-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+async def _in_context(context, coro):
+    # a task takes its context from the loop thread; give it the caller's instead
+    # (e.g. the request's span list, see app.metrics), inherited by tasks it starts
+    for var, value in context.items():
+        var.set(value)
+    return await coro
+
+
+def run(coro, timeout=None):
+    """Run `coro` on the shared loop, in the caller's context, and wait (from a non-loop thread) for its result."""
+    coro = _in_context(contextvars.copy_context(), coro)
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+async def _gather(aws):
+    return await asyncio.gather(*aws)
+
+
+def run_all(coros, timeout=None):
+    """Results of `coros`, run concurrently on the shared loop, in order."""
+    coros = list(coros)
+    if not coros:
+        return []
+    return run(_gather(coros), timeout)
+
+
+# ---------------------------
+# Shared HTTP client
+# ---------------------------
+class AsyncHTTP:
+    """
+    Minimal async HTTP client over httpx.AsyncClient, or over requests in
+    AIO_IO_THREADS threads. Responses expose status_code, headers, content,
+    json() and close() either way.
+    """
+
+    def __init__(self):
+        if httpx is not None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=AIO_MAX_CONNECTIONS,
+                                    max_keepalive_connections=min(AIO_MAX_CONNECTIONS, 100))
+            )
+        else:
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=AIO_IO_THREADS)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+            self._pool = ThreadPoolExecutor(max_workers=AIO_IO_THREADS, thread_name_prefix="aio-io")
+
+    async def request(self, method, url, timeout=None, **kwargs):
+        """Raises requests.RequestException on transport errors, whichever client is used."""
+        if httpx is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool, lambda: self._session.request(method, url, timeout=timeout, **kwargs))
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            return await self._client.request(method, url, timeout=timeout, **kwargs)
+        except httpx.TimeoutException as err:
+            raise requests.Timeout(str(err)) from err
+        except httpx.HTTPError as err:
+            raise requests.ConnectionError(str(err)) from err
+
+    async def get(self, url, timeout=None, **kwargs):
+        return await self.request("GET", url, timeout=timeout, **kwargs)
+
+
+_http = None
+_http_lock = threading.Lock()
+
+
+def get_http():
+    """The shared client; only use it from coroutines on the shared loop."""
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                _http = AsyncHTTP()
+    return _http
+
+
+# ---------------------------
+# Blocking and CPU-bound work
+# ---------------------------
+_io_pool = None
+_cpu_threads = None
+_cpu_processes = None
+_pool_lock = threading.Lock()
+
+
+def map_blocking(fn, items):
+    """fn(item) for every item, concurrently on the I/O thread pool (for blocking SDK calls), in order."""
+    global _io_pool
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    with _pool_lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=AIO_IO_THREADS, thread_name_prefix="aio-blocking")
+    # one copy of the caller's context per item: a context can't be entered by two threads at once
+    contexts = [contextvars.copy_context() for _ in items]
+    return list(_io_pool.map(lambda context, item: context.run(fn, item), contexts, items))
+
+
+def offload(fn, *args, process=False):
+    """
+    fn(*args), run on the CPU executor in async mode and inline otherwise. Use
+    process=True for pure-Python work (it holds the GIL); `fn` and `args` must
+    then be picklable, i.e. a module-level function.
+    """
+    global _cpu_threads, _cpu_processes
+    if not ASYNC_MODE:
+        return fn(*args)
+    with _pool_lock:
+        if process and _cpu_processes is None:
+            # spawn, not fork: forking a process that runs threads can copy held locks
+            _cpu_processes = ProcessPoolExecutor(max_workers=AIO_CPU_WORKERS,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        if not process and _cpu_threads is None:
+            _cpu_threads = ThreadPoolExecutor(max_workers=AIO_CPU_WORKERS, thread_name_prefix="aio-cpu")
+    if process:
+        return _cpu_processes.submit(fn, *args).result()
+    return _cpu_threads.submit(contextvars.copy_context().run, fn, *args).result()
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import re
+from urllib.parse import parse_qsl, urlencode
+from app.blockchain_manager import get_manager
+from app.routes import blockchain, dashboard
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Held-open routes on the event loop
+# ---------------------------
+# Under asgi.py every Flask request runs on one of ASGI_WSGI_THREADS threads, so a
+# request that stays open (an SSE subscriber, a long-poll) would pin a thread for
+# minutes and a few dozen of them would starve everyone else. AsyncRoutes serves
+# the waiting part of those routes as coroutines and only borrows a thread for the
+# parts Flask renders:
+#
+#   - GET /dashboard/stream: subscribes to the feed here, lets the Flask view send
+#     the headers and the Last-Event-ID replay, then streams live events and
+#     heartbeats until the client disconnects.
+#   - GET /blockchain/since/<index>?wait=N: waits here for a block past `index`
+#     (or the deadline), then has the Flask view answer with wait=0.
+#
+# Under plain WSGI (run.py) the views keep holding their thread as before.
+SINCE_PATH = re.compile(r"^/blockchain/since/(\d+)$")
+POLL_SECONDS = 0.25
+
+
+def _reload_chain():
+    manager = get_manager()
+    try:
+        manager.reload()
+    except Exception:
+        # If loading fails, keep current in-memory chain
+        pass
+    return manager
+
+
+async def _until_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+class AsyncRoutes:
+    """ASGI app: the routes above on the event loop, everything else passed to `app` (the WSGI app behind a2wsgi)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            if scope["path"] == "/dashboard/stream":
+                return await self._stream(scope, receive, send)
+            match = SINCE_PATH.match(scope["path"])
+            if match:
+                return await self._blocks_since(int(match.group(1)), scope, receive, send)
+        await self.app(scope, receive, send)
+
+    async def _blocks_since(self, index, scope, receive, send):
+        query = parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+        try:
+            wait = min(int(dict(query).get("wait", 0)), blockchain.MAX_WAIT_SECONDS)
+        except ValueError:
+            wait = 0
+        if wait > 0:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + wait
+            manager = await asyncio.to_thread(_reload_chain)
+            while len(manager.chain) <= index and loop.time() < deadline:
+                await asyncio.sleep(POLL_SECONDS)
+                await asyncio.to_thread(_reload_chain)
+            query = [(k, v) for k, v in query if k != "wait"]
+            scope = dict(scope, query_string=urlencode(query).encode("latin-1"))
+        await self.app(scope, receive, send)
+
+    async def _stream(self, scope, receive, send):
+        # subscribe before the view computes the replay so nothing committed in
+        # between is missed; the view records the last id it replayed in `handoff`
+        subscriber = dashboard._broadcaster.subscribe_async()
+        handoff = {}
+        scope = dict(scope)
+        scope[dashboard.SSE_HANDOFF] = handoff
+        handed_off = False
+
+        async def send_replay(message):
+            nonlocal handed_off
+            if message["type"] == "http.response.body" and not message.get("more_body") and "sent" in handoff:
+                # hold the response open instead of ending it
+                handed_off = True
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_replay)
+            if handed_off:
+                await self._follow(subscriber, handoff["sent"], receive, send)
+        finally:
+            dashboard._broadcaster.unsubscribe(subscriber)
+
+    async def _follow(self, subscriber, sent, receive, send):
+        disconnected = asyncio.ensure_future(_until_disconnect(receive))
+        getter = None
+        try:
+            while True:
+                getter = asyncio.ensure_future(subscriber.queue.get())
+                done, _ = await asyncio.wait((getter, disconnected), timeout=dashboard.HEARTBEAT_SECONDS,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    return
+                if getter in done:
+                    event_id, frame = getter.result()
+                    if event_id is not None and event_id <= sent:
+                        continue
+                    sent = event_id if event_id is not None else sent
+                else:
+                    getter.cancel()
+                    frame = b": keep-alive\n\n"
+                await send({"type": "http.response.body", "body": frame, "more_body": True})
+        except OSError:
+            # some servers raise (uvicorn's ClientDisconnected) on a send after the client left
+            logger.debug("SSE client went away mid-send")
+        finally:
+            disconnected.cancel()
+            if getter is not None:
+                getter.cancel()
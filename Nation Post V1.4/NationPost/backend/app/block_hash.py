@@ -0,0 +1,58 @@
+import hashlib
+import json
+import struct
+from app.compact_chain import hash_to_bytes
+
+# ---------------------------
+# Block hashing
+# ---------------------------
+# Version 1 (legacy): sha256 of json.dumps(block without "hash", sort_keys=True), i.e.
+# the whole block, nested `data` included, re-serialised on every check.
+#
+# Version 2: `data` is digested once when the block is made and the digest is stored
+# in the block as "data_digest"; the block hash covers a fixed 89-byte header:
+#
+#   version (u8) | index (i64) | timestamp (f64) | previous_hash (32) | proof (i64) | data_digest (32)
+#
+# so checking a hash or a link never touches `data`. Blocks carry "version": 2;
+# blocks without a version are version 1 and keep verifying as before.
+HASH_VERSION = 2
+HEADER_V2 = struct.Struct("<Bqd32sq32s")
+
+
+def canonical_data(data):
+    """The exact bytes a version 2 data_digest is taken over."""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def data_digest(data):
+    return hashlib.sha256(canonical_data(data)).hexdigest()
+
+
+def header_hash(index, timestamp, previous_hash_bytes, proof, digest_bytes, version=HASH_VERSION):
+    """Version 2 block hash (hex) from header fields; hashes are passed as 32 raw bytes."""
+    header = HEADER_V2.pack(version, index, timestamp, previous_hash_bytes, proof, digest_bytes)
+    return hashlib.sha256(header).hexdigest()
+
+
+def legacy_hash(block):
+    unhashed = {k: v for k, v in block.items() if k != "hash"}
+    return hashlib.sha256(json.dumps(unhashed, sort_keys=True).encode()).hexdigest()
+
+
+def block_hash(block):
+    """Hash of a block dict (its own "hash" key, if any, is ignored) under the block's version."""
+    if block.get("version", 1) == 1:
+        return legacy_hash(block)
+    digest = block.get("data_digest") or data_digest(block.get("data"))
+    return header_hash(int(block["index"]), float(block["timestamp"]), hash_to_bytes(block["previous_hash"]),
+                       int(block["proof"]), bytes.fromhex(digest), int(block["version"]))
+
+
+def seal(block, version=HASH_VERSION):
+    """Stamp `block` (index, timestamp, data, previous_hash, proof) with its version, digest and hash."""
+    if version >= 2:
+        block["version"] = version
+        block["data_digest"] = data_digest(block.get("data"))
+    block["hash"] = block_hash(block)
+    return block
@@ -1,71 +1,527 @@
-import hashlib, json, time, os
+import hashlib, json, time, os, shutil, threading, logging
+from app import aio
+from app.metrics import span
+from app.block_hash import HASH_VERSION, block_hash, data_digest, header_hash, legacy_hash, seal
+from app.compact_chain import (
+    CompactChain, LegacyFormat, scan_chain_file, write_chain_file, append_chain_file, hash_to_bytes
+)
+from app.file_lock import FileLock
+from app.chain_segments import SEGMENT_BLOCKS, SegmentCorrupt, open_segments, seal_segments
+
+logger = logging.getLogger(__name__)
+
+# Hash version of newly mined blocks (see app.block_hash). Set to 1 while workers
+# that only understand version 1 still share the chain.
+BLOCK_VERSION = int(os.getenv("CHAIN_HASH_VERSION", str(HASH_VERSION)))
+
+def block_data(block):
+    """A block's `data` if it is an object, else {} (e.g. a block mined from a non-object /mine body)."""
+    data = block.get("data")
+    return data if isinstance(data, dict) else {}
+
+
+def find_proof(previous_proof):
+    new_proof = 1
+    while True:
+        guess = f'{new_proof ** 2 - previous_proof ** 2}'.encode()
+        guess_hash = hashlib.sha256(guess).hexdigest()
+        if guess_hash[:4] == "0000":
+            return new_proof
+        new_proof += 1
+
 
 class BlockchainManager:
     def __init__(self, file_path="data/blockchain.json"):
         self.file_path = file_path
+        # sealed history (see app.chain_segments); absolute, since it is written from a background thread
+        self.segments_dir = os.path.abspath(os.path.splitext(file_path)[0] + ".segments")
+        self._sealing = False
+        # offset of the closing bracket in the chain file, i.e. where the next block goes
+        self._file_end = 0
+        self._reset_indexes()
+        # Writers: _state_lock serialises threads in this process, the file lock
+        # serialises processes (gunicorn workers) sharing the chain file.
+        self._state_lock = threading.RLock()
+        self._file_lock = FileLock(f"{file_path}.lock")
+        # Group commit: add_block callers queue here and one leader commits them all
+        self._pending = []
+        self._committing = False
+        # Read replicas (see app.chain_follower) only take blocks from their primary
+        self.read_only = False
+        # Called with the list of new block dicts whenever blocks are committed here or
+        # picked up from the file / a primary. Must be quick and must not raise.
+        self._listeners = []
+        self._commit_cond = threading.Condition()
         if not os.path.exists("data"):
             os.makedirs("data")
-        if not os.path.exists(file_path):
-            self.chain = [self.create_genesis_block()]
-            self._save_chain()
-        else:
-            self.chain = self._load_chain()
+        with self._state_lock, self._file_lock:
+            # whole-chain snapshots from before segments are no longer read
+            legacy_snapshot = os.path.splitext(file_path)[0] + ".snap"
+            if os.path.exists(legacy_snapshot):
+                os.remove(legacy_snapshot)
+            if not os.path.exists(file_path):
+                self.chain = [self.create_genesis_block()]
+                self._save_chain()
+            else:
+                self.chain = self._load_chain()
+        self._maybe_seal()
 
     def create_genesis_block(self):
-        return {
+        return self.seal_block({
             "index": 1,
             "timestamp": time.time(),
             "data": {"message": "Genesis Block"},
             "previous_hash": "0",
-            "hash": self.hash_block({
-                "index": 1,
-                "timestamp": time.time(),
-                "data": {"message": "Genesis Block"},
-                "previous_hash": "0"
-            }),
             "proof": 1
-        }
+        })
 
     def hash_block(self, block):
-        encoded = json.dumps(block, sort_keys=True).encode()
-        return hashlib.sha256(encoded).hexdigest()
+        """Hash of `block` under its own version (any "hash" key is ignored)."""
+        return block_hash(block)
+
+    def seal_block(self, block):
+        """Add version, data_digest and hash to a freshly built block."""
+        return seal(block, BLOCK_VERSION)
 
     def _save_chain(self):
-        with open(self.file_path, "w") as f:
-            json.dump(self.chain, f, indent=2)
+        """Rewrite the whole chain file from self.chain (dicts or records) and reload it."""
+        with self._state_lock, self._file_lock:
+            with span("chain_save"):
+                write_chain_file(self.file_path, self.chain)
+                if isinstance(self.chain, CompactChain):
+                    self.chain.close()
+            self._drop_stale_segments()
+            self.chain = self._load_chain()
+        self._maybe_seal()
 
     def _load_chain(self):
-        with open(self.file_path, "r") as f:
-            return json.load(f)
+        """
+        Load the chain file into a CompactChain, rebuilding the secondary indexes.
+
+        If sealed segments matching the file exist, the blocks they hold are served
+        from them and only the tail appended after the last one is parsed. Pretty-printed
+        files from older versions are converted to the line layout first.
+        """
+        base = open_segments(self.segments_dir)
+        if base is not None:
+            if self._segments_match(base):
+                chain = CompactChain(self.file_path, base)
+                indexes = base.indexes()
+                self.user_index = indexes.get("user", {})
+                self.category_index = indexes.get("category", {})
+                self._file_end = scan_chain_file(chain, base.log_end, self._index_block)
+                return chain
+            # the chain file was rewritten or replaced since; reseal it from scratch
+            base.close()
+            self._discard_segments()
+
+        chain = CompactChain(self.file_path)
+        self._reset_indexes()
+        try:
+            self._file_end = scan_chain_file(chain, 0, self._index_block)
+        except LegacyFormat:
+            with self._file_lock:
+                chain = CompactChain(self.file_path)
+                self._reset_indexes()
+                try:
+                    # another worker may have converted it while we waited for the lock
+                    self._file_end = scan_chain_file(chain, 0, self._index_block)
+                except LegacyFormat:
+                    with open(self.file_path, "r") as f:
+                        write_chain_file(self.file_path, json.load(f))
+                    chain = CompactChain(self.file_path)
+                    self._reset_indexes()
+                    self._file_end = scan_chain_file(chain, 0, self._index_block)
+        return chain
+
+    def reload(self, wait=False):
+        """
+        Pick up blocks other processes appended, reading only the new lines when possible.
+        Readers don't wait for an in-flight commit (wait=False): they keep serving the
+        current in-memory chain, which that commit is about to extend anyway.
+        """
+        if not self._state_lock.acquire(blocking=wait):
+            return
+        try:
+            chain = self.chain
+            if isinstance(chain, CompactChain) and len(chain) and self._still_prefix(chain):
+                if os.path.getsize(self.file_path) != self._file_end + 2:
+                    new_blocks = []
+
+                    def on_block(pos, block):
+                        self._index_block(pos, block)
+                        new_blocks.append(block)
+
+                    self._file_end = scan_chain_file(chain, self._file_end, on_block)
+                    self._notify(new_blocks)
+                return
+            # history was rewritten (or never loaded): start over
+            self.chain = self._load_chain()
+        finally:
+            self._state_lock.release()
+        self._maybe_seal()
+
+    def _still_prefix(self, chain):
+        """True if the file still holds our last block at the same offset (i.e. it was only appended to)."""
+        try:
+            chain.close()
+            return chain.read_log_block(len(chain) - 1).get("hash") == chain.hash_at(len(chain) - 1)
+        except (OSError, ValueError):
+            return False
+
+    # ---------------------------
+    # Sealed segments
+    # ---------------------------
+    def _segments_match(self, base):
+        """
+        Segments are usable if the chain file still has their last block where they
+        say (a cheap check; is_chain_valid(deep=True) compares every sealed line) and
+        they record their chain file ranges.
+        """
+        try:
+            if not base.has_log_digests() or os.path.getsize(self.file_path) < base.log_end:
+                return False
+            with open(self.file_path, "rb") as f:
+                f.seek(base.last_log_offset)
+                block = json.loads(f.read(base.last_log_length))
+            return block.get("hash") == base.hash_bytes(base.count - 1).hex()
+        except (OSError, ValueError):  # includes SegmentCorrupt
+            return False
+
+    def _drop_stale_segments(self):
+        """
+        After a full rewrite: discard the segments if their byte ranges in the chain
+        file changed (lines appended before encode_block fixed its key order are
+        re-encoded differently), so they are resealed from the new file.
+        """
+        base = open_segments(self.segments_dir)
+        if base is None:
+            return
+        try:
+            base.check_log(self.file_path)
+        except (OSError, SegmentCorrupt):
+            self._discard_segments()
+        finally:
+            base.close()
+
+    def _discard_segments(self):
+        shutil.rmtree(self.segments_dir, ignore_errors=True)
+
+    def _maybe_seal(self):
+        """Seal full segments in the background once the in-memory tail holds at least one."""
+        chain = self.chain
+        if not isinstance(chain, CompactChain) or len(chain) - chain.base_count < SEGMENT_BLOCKS:
+            return
+        with self._state_lock:
+            if self._sealing or chain is not self.chain:
+                return
+            self._sealing = True
+            # whole segments only, leaving a tail of fewer than SEGMENT_BLOCKS in memory
+            count = len(chain) - (len(chain) - chain.base_count) % SEGMENT_BLOCKS
+            # the first unsealed line starts at its leading comma; with none, at the closing bracket
+            log_end = chain.log_location(count)[0] - 1 if count < len(chain) else self._file_end
+            indexes = {
+                "user": {k: list(v) for k, v in self.user_index.items()},
+                "category": {k: list(v) for k, v in self.category_index.items()}
+            }
+        threading.Thread(
+            target=self._seal, args=(chain, count, log_end, indexes), daemon=True
+        ).start()
+
+    def _seal(self, chain, count, log_end, indexes):
+        try:
+            seal_segments(self.segments_dir, chain, count, log_end, chain.log_location(count - 1), indexes)
+            # another worker may have sealed first; its segments serve just as well if they hold our blocks
+            base = open_segments(self.segments_dir)
+            with self._state_lock:
+                if (base is None or chain is not self.chain or not chain.base_count < base.count <= len(chain)
+                        or base.hash_bytes(base.count - 1) != chain.hash_bytes(base.count - 1)):
+                    return
+                # Serve the sealed blocks from their segments and keep only the tail in memory
+                remapped = CompactChain(self.file_path, base)
+                for pos in range(base.count, len(chain)):
+                    remapped.append_raw(*chain.header(pos), *chain.log_location(pos))
+                self.chain = remapped
+        except Exception as e:
+            logger.warning("Sealing chain segments failed: %s", e)
+        finally:
+            self._sealing = False
+
+    # ---------------------------
+    # Secondary indexes (chain positions, oldest-first)
+    # ---------------------------
+    def _reset_indexes(self):
+        self.user_index = {}
+        self.category_index = {}
+
+    def _index_block(self, pos, block):
+        data = block_data(block)
+        if not data.get("metadata_hash"):
+            return
+        uploader = data.get("uploaded_by")
+        user_id = uploader.get("userID") if isinstance(uploader, dict) else None
+        if user_id:
+            self.user_index.setdefault(user_id, []).append(pos)
+        category = self.normalize_category(data.get("category"))
+        if category:
+            self.category_index.setdefault(category, []).append(pos)
 
+    @staticmethod
+    def normalize_category(category):
+        return (category or "").strip().lower() or None
+
+    # ---------------------------
+    # Writes (group commit)
+    # ---------------------------
     def add_block(self, data):
-        prev_block = self.chain[-1]
-        proof = self.proof_of_work(prev_block["proof"])
-        block = {
-            "index": len(self.chain) + 1,
-            "timestamp": time.time(),
-            "data": data,
-            "previous_hash": prev_block["hash"],
-            "proof": proof
-        }
-        block["hash"] = self.hash_block(block)
-        self.chain.append(block)
-        self._save_chain()
-        return block
+        """
+        Mine and durably append a block holding `data`, returning it.
+
+        Concurrent callers are group-committed: the first one in becomes the leader,
+        takes the cross-process file lock, catches up with blocks other workers wrote,
+        mines every queued block on top of the real tip and appends them with a single
+        write + fsync. Callers that queued meanwhile wait and are committed in the next
+        batch by whichever of them takes over.
+        """
+        if self.read_only:
+            raise RuntimeError("This node is a read-only replica; send writes to the primary")
+        pending = {"data": data, "block": None, "error": None, "done": False}
+        with self._commit_cond:
+            self._pending.append(pending)
+            while self._committing and not pending["done"]:
+                self._commit_cond.wait()
+            if not pending["done"]:
+                self._committing = True
+                batch, self._pending = self._pending, []
+            else:
+                batch = None
+
+        if batch is not None:
+            try:
+                self._commit_batch(batch)
+            finally:
+                with self._commit_cond:
+                    self._committing = False
+                    self._commit_cond.notify_all()
+
+        if pending["error"] is not None:
+            raise pending["error"]
+        return pending["block"]
+
+    def _commit_batch(self, batch):
+        try:
+            with self._state_lock, self._file_lock:
+                self.reload(wait=True)
+                blocks = []
+                prev_hash = self.chain[-1]["hash"]
+                prev_proof = self.chain[-1]["proof"]
+                for item in batch:
+                    with span("pow_mining"):
+                        proof = self.proof_of_work(prev_proof)
+                    block = {
+                        "index": len(self.chain) + len(blocks) + 1,
+                        "timestamp": time.time(),
+                        "data": item["data"],
+                        "previous_hash": prev_hash,
+                        "proof": proof
+                    }
+                    blocks.append(self.seal_block(block))
+                    prev_hash, prev_proof = block["hash"], proof
+
+                with span("chain_save"):
+                    placements, self._file_end = append_chain_file(self.file_path, self._file_end, blocks)
+                # the blocks are durable from here on, so nothing below fails their callers
+                for item, block in zip(batch, blocks):
+                    item["block"] = block
+                self._apply_appended(blocks, placements)
+            self._maybe_seal()
+        except Exception as e:
+            if batch[0]["block"] is not None:
+                logger.exception("Error after committing %d blocks: %s", len(batch), e)
+            for item in batch:
+                if item["block"] is None:
+                    item["error"] = e
+        finally:
+            for item in batch:
+                item["done"] = True
+
+    def append_blocks(self, blocks):
+        """
+        Append blocks mined elsewhere (a replica's primary) after checking each one
+        extends our tip: consecutive index, previous_hash link, recomputed hash and a
+        valid proof. Blocks we already have are skipped. Returns how many were added.
+        """
+        with self._state_lock, self._file_lock:
+            self.reload(wait=True)
+            tip = self.chain[-1]
+            prev_index, prev_hash, prev_proof = tip["index"], tip["hash"], tip["proof"]
+            accepted = []
+            for block in blocks:
+                if block.get("index", 0) <= prev_index and not accepted:
+                    continue
+                if not self.valid_next_block(prev_index, prev_hash, prev_proof, block):
+                    raise ValueError(f"Block {block.get('index')} does not extend the local chain")
+                accepted.append(block)
+                prev_index, prev_hash, prev_proof = block["index"], block["hash"], block["proof"]
+            if not accepted:
+                return 0
+            with span("chain_save"):
+                placements, self._file_end = append_chain_file(self.file_path, self._file_end, accepted)
+            self._apply_appended(accepted, placements)
+        self._maybe_seal()
+        return len(accepted)
+
+    def _apply_appended(self, blocks, placements):
+        """
+        Add blocks just appended to the chain file to the in-memory chain and indexes,
+        then tell the listeners. They are already on disk, so if that fails part way
+        the chain is reloaded from the file rather than left out of step with it.
+        """
+        try:
+            for block, placement in zip(blocks, placements):
+                self.chain.append(block, *placement)
+                self._index_block(len(self.chain) - 1, block)
+        except Exception as e:
+            logger.warning("Reloading the chain after failing to add appended blocks: %s", e)
+            self.chain = self._load_chain()
+        self._notify(blocks)
+
+    # ---------------------------
+    # New-block listeners
+    # ---------------------------
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, blocks):
+        if not blocks:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(blocks)
+            except Exception as e:
+                logger.warning("Block listener %r failed: %s", callback, e)
+
+    def valid_next_block(self, prev_index, prev_hash, prev_proof, block):
+        try:
+            guess = f'{block["proof"] ** 2 - prev_proof ** 2}'.encode()
+            return (
+                block["index"] == prev_index + 1
+                and block["previous_hash"] == prev_hash
+                and (block.get("version", 1) == 1 or block["data_digest"] == data_digest(block.get("data")))
+                and self.hash_block(block) == block["hash"]
+                and hashlib.sha256(guess).hexdigest()[:4] == "0000"
+            )
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def blocks_between(self, start, stop):
+        """Block dicts for chain positions [start, stop), clamped to the chain."""
+        chain = self.chain
+        start, stop = max(0, start), min(len(chain), stop)
+        return [chain[pos].to_dict() for pos in range(start, stop)]
 
     def proof_of_work(self, previous_proof):
-        new_proof = 1
-        while True:
-            guess = f'{new_proof ** 2 - previous_proof ** 2}'.encode()
-            guess_hash = hashlib.sha256(guess).hexdigest()
-            if guess_hash[:4] == "0000":
-                return new_proof
-            new_proof += 1
-
-    def is_chain_valid(self):
-        for i in range(1, len(self.chain)):
-            curr = self.chain[i]
-            prev = self.chain[i-1]
-            if curr["previous_hash"] != self.hash_block(prev):
-                return False
-        return True
+        # pure Python, so in async mode it runs in another process rather than holding the GIL
+        return aio.offload(find_proof, previous_proof, process=True)
+
+    def is_chain_valid(self, deep=True):
+        """
+        Check that every block links to its predecessor's hash and that its own hash
+        is right. Version 2 hashes are recomputed from the header columns, and each
+        block's data is re-digested against its data_digest; deep=False skips that
+        (a header-only pass that can't see tampered data). Blocks served from sealed
+        segments are also compared, in deep mode, against their lines in the chain
+        file, which must not have changed since sealing. Version 1 blocks are
+        re-serialised in full. The version 1 genesis block is exempt: it was built
+        with two time.time() calls, so its stored timestamp isn't the one hashed.
+        """
+        chain = self.chain
+        if isinstance(chain, CompactChain):
+            header_at, block_at = chain.header, (lambda pos: chain[pos].to_dict())
+        else:
+            block_at = chain.__getitem__
+
+            def header_at(pos):
+                b = chain[pos]
+                version = b.get("version", 1)
+                digest = bytes.fromhex(b["data_digest"]) if version >= 2 else None
+                return (b["index"], b["timestamp"], b["proof"], hash_to_bytes(b["hash"]),
+                        hash_to_bytes(b["previous_hash"]), version, digest)
+
+        try:
+            if deep and isinstance(chain, CompactChain) and chain.base is not None:
+                chain.base.check_log(self.file_path)
+            prev_hash = None
+            for pos in range(len(chain)):
+                index, timestamp, proof, hash_bytes, previous_hash_bytes, version, digest_bytes = header_at(pos)
+                if prev_hash is not None and previous_hash_bytes != prev_hash:
+                    return False
+                prev_hash = hash_bytes
+                if version >= 2:
+                    if header_hash(index, timestamp, previous_hash_bytes, proof, digest_bytes, version) != hash_bytes.hex():
+                        return False
+                    if deep and data_digest(block_at(pos).get("data")) != digest_bytes.hex():
+                        return False
+                elif pos > 0 and legacy_hash(block_at(pos)) != hash_bytes.hex():
+                    return False
+            return True
+        except SegmentCorrupt as e:
+            # an archived segment no longer matches its checkpoint or the chain file
+            logger.warning("Chain segment failed verification: %s", e)
+            return False
+
+    # ---------------------------
+    # Hash version migration
+    # ---------------------------
+    def migrate_hashes(self, version=HASH_VERSION):
+        """
+        Rewrite the whole chain with every block re-hashed under `version`, relinking
+        previous_hash as it goes. Block hashes change, so anything that stored an old
+        hash (article metadata's block_hash, replicas) must be refreshed; the old file
+        is kept as <file>.pre-v<version>.bak. Proofs are kept: proof-of-work only depends on
+        the previous proof, not on hashes. Returns the number of blocks rewritten.
+        """
+        with self._state_lock, self._file_lock:
+            self.reload(wait=True)
+            backup = f"{self.file_path}.pre-v{version}.bak"
+            blocks = []
+            prev_hash = "0"
+            for record in self.chain:
+                block = {k: v for k, v in record.to_dict().items() if k not in ("version", "data_digest", "hash")}
+                block["previous_hash"] = prev_hash
+                prev_hash = seal(block, version)["hash"]
+                blocks.append(block)
+            self.chain.release()
+            os.replace(self.file_path, backup)
+            self._discard_segments()
+            self.chain = blocks
+            self._save_chain()
+            logger.warning("Re-hashed %d blocks as version %d; previous chain kept at %s",
+                           len(blocks), version, backup)
+            return len(blocks)
+
+
+# ---------------------------
+# Shared manager, created on first use
+# ---------------------------
+# Every blueprint used to build its own BlockchainManager at import time, which
+# meant parsing the chain file once per blueprint before the first request.
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = BlockchainManager()
+                primary = os.getenv("CHAIN_PRIMARY_URL")
+                if primary:
+                    from app.chain_follower import ChainFollower
+                    ChainFollower(_manager, primary).start()
+    return _manager
@@ -0,0 +1,113 @@
+import itertools
+import logging
+import os
+import queue
+import threading
+from app.blockchain_manager import block_data
+from app.media_cache import get_media_cache, is_cid
+from app.metadata_cache import get_metadata_cache
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Cache warming
+# ---------------------------
+# New article blocks (and, at startup, the newest WARM_BACKFILL of them) have their
+# metadata document and thumbnail pulled into the local caches in the background,
+# so the first dashboard reader of an article doesn't wait on a gateway.
+WARM_BACKFILL = int(os.getenv("CACHE_WARM_BACKFILL", "50"))
+WARM_CONCURRENCY = int(os.getenv("CACHE_WARM_CONCURRENCY", "4"))
+THUMBNAIL_WIDTH = 640  # the card grid's variant, see frontend/src/data/mockData.ts
+
+NEW_BLOCK, BACKFILL = 0, 1  # queue priorities: fresh uploads go first
+
+
+def _thumbnail_cid(data, metadata):
+    """Same choice as the dashboard cards: the block's thumbnail, else the "<title> - image 1" pin, else the first file."""
+    if data.get("thumbnail"):
+        return data["thumbnail"]
+    files = (metadata or {}).get("files") or []
+    expected_pin = f"{((metadata or {}).get('title') or '').strip()} - image 1"
+    for f in files:
+        if isinstance(f, dict) and f.get("pin_name") == expected_pin:
+            return f.get("ipfsHash")
+    return files[0].get("ipfsHash") if files and isinstance(files[0], dict) else None
+
+
+class CacheWarmer:
+    def __init__(self, manager, metadata_cache=None, media_cache=None, concurrency=WARM_CONCURRENCY):
+        self.manager = manager
+        self.metadata_cache = metadata_cache or get_metadata_cache()
+        self.media_cache = media_cache or get_media_cache()
+        self.concurrency = concurrency
+        self._queue = queue.PriorityQueue(maxsize=1024)
+        self._seq = itertools.count()
+        self._threads = []
+
+    def start(self, backfill=WARM_BACKFILL):
+        self.manager.add_listener(self._on_blocks)
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._run, name=f"cache-warmer-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        self.backfill(backfill)
+        return self
+
+    def backfill(self, limit):
+        """Queue the newest `limit` article blocks already on the chain."""
+        queued = 0
+        for block in reversed(self.manager.chain):
+            if queued >= limit:
+                break
+            data = block_data(block)
+            if data.get("metadata_hash"):
+                self._enqueue(BACKFILL, data)
+                queued += 1
+        logger.debug("Cache warmer queued %d existing articles", queued)
+
+    def _on_blocks(self, blocks):
+        # runs inside the manager's commit, so only queue work here
+        for block in blocks:
+            data = block_data(block)
+            if data.get("metadata_hash"):
+                self._enqueue(NEW_BLOCK, data)
+
+    def _enqueue(self, priority, data):
+        try:
+            self._queue.put_nowait((priority, next(self._seq), data))
+        except queue.Full:
+            logger.debug("Cache warmer queue full, skipping %s", data.get("metadata_hash"))
+
+    def _run(self):
+        while True:
+            _, _, data = self._queue.get()
+            try:
+                self.warm(data)
+            except Exception as e:
+                logger.warning("Cache warming failed for %s: %s", data.get("metadata_hash"), e)
+
+    def warm(self, data):
+        cid = data.get("metadata_hash")
+        metadata = self.metadata_cache.fetch(cid, data.get("ipfs_url"))
+        thumbnail = _thumbnail_cid(data, metadata)
+        if is_cid(thumbnail) and self.media_cache.get(thumbnail) is not None:
+            self.media_cache.variant(thumbnail, THUMBNAIL_WIDTH)
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_warmer():
+    """Start the shared warmer in the background (the chain load it needs included)."""
+    def _start():
+        global _warmer
+        from app.blockchain_manager import get_manager
+        with _warmer_lock:
+            if _warmer is None:
+                try:
+                    _warmer = CacheWarmer(get_manager()).start()
+                except Exception as e:
+                    logger.warning("Could not start the cache warmer: %s", e)
+
+    threading.Thread(target=_start, name="cache-warmer-start", daemon=True).start()
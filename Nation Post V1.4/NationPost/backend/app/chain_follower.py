@@ -0,0 +1,76 @@
+import logging
+import os
+import threading
+import requests
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Read replica: follow a primary's chain
+# ---------------------------
+# Long-poll the primary's /blockchain/since/<index> for blocks past our tip, check
+# they extend it and append them locally, so bandwidth tracks new blocks only.
+LONG_POLL_SECONDS = int(os.getenv("CHAIN_FOLLOW_WAIT", "25"))
+BATCH_LIMIT = 500
+RETRY_SECONDS = 5
+
+
+class ChainFollower:
+    def __init__(self, manager, primary_url, wait=LONG_POLL_SECONDS):
+        self.manager = manager
+        self.primary_url = primary_url.rstrip("/")
+        self.wait = wait
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chain-follower", daemon=True)
+        manager.read_only = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        try:
+            self._adopt_genesis()
+        except Exception as e:
+            logger.warning("Could not fetch genesis block from %s: %s", self.primary_url, e)
+        while not self._stop.is_set():
+            try:
+                added, has_more = self.poll_once()
+                if not added and not has_more:
+                    # the primary answered without waiting (or timed out); don't spin
+                    self._stop.wait(1)
+            except Exception as e:
+                logger.warning("Chain sync from %s failed: %s", self.primary_url, e)
+                self._stop.wait(RETRY_SECONDS)
+
+    def _adopt_genesis(self):
+        """A fresh replica mined its own genesis block; swap it for the primary's."""
+        manager = self.manager
+        if len(manager.chain) != 1:
+            return
+        r = requests.get(f"{self.primary_url}/blockchain/range", params={"from": 1, "to": 1}, timeout=15)
+        r.raise_for_status()
+        genesis = r.json()["blocks"][0]
+        if genesis["hash"] != manager.chain[0]["hash"]:
+            manager.chain = [genesis]
+            manager._save_chain()
+
+    def poll_once(self):
+        """Fetch and append the next batch; returns (blocks added, more waiting on the primary)."""
+        tip = self.manager.chain[-1]["index"]
+        r = requests.get(
+            f"{self.primary_url}/blockchain/since/{tip}",
+            params={"limit": BATCH_LIMIT, "wait": self.wait},
+            timeout=self.wait + 15
+        )
+        r.raise_for_status()
+        body = r.json()
+        blocks = body.get("blocks") or []
+        added = self.manager.append_blocks(blocks) if blocks else 0
+        if added:
+            logger.info("Replicated %d block(s) from %s (tip %s)", added, self.primary_url,
+                        self.manager.chain[-1]["index"])
+        return added, bool(body.get("has_more"))
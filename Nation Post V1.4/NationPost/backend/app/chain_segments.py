@@ -0,0 +1,327 @@
+import bisect
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from app.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Segmented chain archive
+# ---------------------------
+# Sealed history lives next to the chain file in <chain>.segments/:
+#
+#   manifest.json       the sealed segments in order, each with its block range, the
+#                       hash it links to and ends with, its checkpoint, and the byte
+#                       range its blocks occupy in the chain file with that range's
+#                       sha256; where the sealed blocks end in the chain file; the
+#                       user/category indexes
+#   seg-<first>.npseg   SEGMENT_BLOCKS consecutive blocks, written once, never changed:
+#
+#     header       MAGIC, version, first position, block count, section offsets
+#     records      one fixed-width record per block: index, timestamp, proof, hash,
+#                  previous_hash, data offset and length, hash version, data_digest
+#     hash table   (hash, position) pairs sorted by hash, for binary-search lookups
+#     data         every block's `data` as compact JSON, zlib-compressed as one blob
+#
+# A segment's checkpoint is sha256(previous segment's checkpoint + its block hashes),
+# so the checkpoints chain like the blocks do; a segment is checked against its
+# checkpoint and its link to the previous segment the first time it is opened.
+#
+# Opened segments are kept in an LRU of CHAIN_SEGMENT_CACHE; records and hashes are
+# read from the mapped file, and the data blob is only decompressed when a block's
+# data is asked for. The chain file (blockchain.json) stays the source of truth:
+# segments are derived from it and rebuilt from it if they stop matching. Loading
+# only checks that the last sealed block is still where the manifest says. An
+# edit anywhere else in sealed history is not seen there (reads keep coming from
+# the segment) and is only caught by is_chain_valid(deep=True), which re-digests
+# every sealed byte range of the chain file (SegmentStore.check_log).
+SEGMENT_BLOCKS = int(os.getenv("CHAIN_SEGMENT_BLOCKS", "1000"))
+SEGMENT_CACHE = int(os.getenv("CHAIN_SEGMENT_CACHE", "8"))
+COMPRESS_LEVEL = 6
+
+MAGIC = b"NPSEG001"
+VERSION = 1
+MANIFEST = "manifest.json"
+HEADER = struct.Struct("<8sIQQQQQ")
+RECORD = struct.Struct("<qdq32s32sQQB32s")
+HASH_ENTRY = struct.Struct("<32sQ")
+
+
+class SegmentCorrupt(ValueError):
+    """A sealed segment doesn't match its manifest checkpoint or link."""
+
+
+def checkpoint(previous_checkpoint, hashes):
+    """Checkpoint (hex) of a segment whose block hashes, concatenated, are `hashes`."""
+    return hashlib.sha256(bytes.fromhex(previous_checkpoint) + hashes).hexdigest()
+
+
+def log_digest(path, start, end):
+    """sha256 (hex) of bytes [start, end) of the file at `path`."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            h.update(chunk)
+            remaining -= len(chunk)
+    return h.hexdigest()
+
+
+class Segment:
+    """Read-only, memory-mapped view of one sealed segment file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.first, self.count, self.records_at, self.hash_table_at, self.data_at = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise SegmentCorrupt(f"{path} is not a version {VERSION} chain segment")
+        self._data = None
+        self._data_lock = threading.Lock()
+
+    def record(self, i):
+        """(index, timestamp, proof, hash bytes, previous_hash bytes, data offset, data length,
+        version, data_digest bytes) of the segment's i-th block"""
+        return RECORD.unpack_from(self._mm, self.records_at + i * RECORD.size)
+
+    def header(self, i):
+        record = self.record(i)
+        return record[:5] + record[7:]
+
+    def hash_bytes(self, i):
+        start = self.records_at + i * RECORD.size + 24
+        return self._mm[start:start + 32]
+
+    def hashes(self):
+        return b"".join(self.hash_bytes(i) for i in range(self.count))
+
+    def data(self, i):
+        with self._data_lock:
+            if self._data is None:
+                self._data = zlib.decompress(self._mm[self.data_at:])
+        record = self.record(i)
+        return json.loads(self._data[record[5]:record[5] + record[6]])
+
+    def find(self, needle):
+        """Segment-relative position of the block whose hash is `needle`, or -1."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry_hash, i = HASH_ENTRY.unpack_from(self._mm, self.hash_table_at + mid * HASH_ENTRY.size)
+            if entry_hash < needle:
+                lo = mid + 1
+            elif entry_hash > needle:
+                hi = mid
+            else:
+                return i
+        return -1
+
+
+def write_segment(path, chain, first, count):
+    """Write blocks [first, first + count) of `chain` (a CompactChain) as a segment file."""
+    records = bytearray()
+    data = bytearray()
+    for pos in range(first, first + count):
+        encoded = json.dumps(chain.read_data(pos), separators=(",", ":")).encode()
+        index, timestamp, proof, hash_bytes, previous_hash_bytes, version, digest_bytes = chain.header(pos)
+        records += RECORD.pack(index, timestamp, proof, hash_bytes, previous_hash_bytes, len(data), len(encoded),
+                               version, digest_bytes)
+        data += encoded
+    entries = sorted((bytes(chain.hash_bytes(pos)), pos - first) for pos in range(first, first + count))
+    hash_table = b"".join(HASH_ENTRY.pack(h, i) for h, i in entries)
+    records_at = HEADER.size
+    hash_table_at = records_at + len(records)
+    data_at = hash_table_at + len(hash_table)
+    header = HEADER.pack(MAGIC, VERSION, first, count, records_at, hash_table_at, data_at)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for part in (header, records, hash_table, zlib.compress(bytes(data), COMPRESS_LEVEL)):
+            f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SegmentStore:
+    """
+    The sealed part of the chain: blocks at positions [0, count), served from
+    segment files. Offers the read interface CompactChain expects of its base
+    (header, hash_bytes, data, find) plus where the sealed blocks end in the
+    chain file (log_end, last_log_offset, last_log_length).
+    """
+
+    def __init__(self, root, manifest, cache_size=SEGMENT_CACHE):
+        self.root = root
+        self.entries = manifest["segments"]
+        self._firsts = [entry["first"] for entry in self.entries]
+        self.count = manifest["count"]
+        self.log_end = manifest["log_end"]
+        self.last_log_offset, self.last_log_length = manifest["last_log"]
+        self._indexes = manifest["indexes"]
+        self.cache_size = max(1, cache_size)
+        self._cache = OrderedDict()   # segment number -> Segment
+        self._verified = set()        # segments whose checkpoint has been checked (they never change)
+        self._lock = threading.Lock()
+
+    def _locate(self, pos):
+        n = bisect.bisect_right(self._firsts, pos) - 1
+        return n, pos - self._firsts[n]
+
+    def _open(self, n):
+        entry = self.entries[n]
+        segment = Segment(os.path.join(self.root, entry["file"]))
+        previous = self.entries[n - 1] if n else None
+        expected_link = previous["last_hash"] if previous else "0" * 64
+        if segment.first != entry["first"] or segment.count != entry["count"]:
+            raise SegmentCorrupt(f"{entry['file']} does not cover the blocks its manifest entry says")
+        if n in self._verified:
+            return segment
+        if segment.header(0)[4].hex() != expected_link:
+            raise SegmentCorrupt(f"{entry['file']} does not link to the segment before it")
+        if checkpoint(previous["checkpoint"] if previous else "0" * 64, segment.hashes()) != entry["checkpoint"]:
+            raise SegmentCorrupt(f"{entry['file']} does not match its checkpoint")
+        self._verified.add(n)
+        return segment
+
+    def segment(self, n, cache=True):
+        """Segment number `n`, through the LRU (or, with cache=False, without disturbing it)."""
+        with self._lock:
+            segment = self._cache.get(n)
+            if segment is not None:
+                self._cache.move_to_end(n)
+                return segment
+        segment = self._open(n)
+        if cache:
+            with self._lock:
+                segment = self._cache.setdefault(n, segment)
+                self._cache.move_to_end(n)
+                while len(self._cache) > self.cache_size:
+                    # dropped, not closed: a reader may still hold it; the mapping goes with it
+                    self._cache.popitem(last=False)
+        return segment
+
+    def header(self, pos):
+        n, i = self._locate(pos)
+        return self.segment(n).header(i)
+
+    def hash_bytes(self, pos):
+        n, i = self._locate(pos)
+        return self.segment(n).hash_bytes(i)
+
+    def data(self, pos):
+        n, i = self._locate(pos)
+        return self.segment(n).data(i)
+
+    def find(self, needle):
+        """Position of the block whose hash is `needle` (32 bytes), or -1; newest segments first."""
+        for n in range(len(self.entries) - 1, -1, -1):
+            i = self.segment(n, cache=False).find(needle)
+            if i >= 0:
+                return self.entries[n]["first"] + i
+        return -1
+
+    def indexes(self):
+        return self._indexes
+
+    def has_log_digests(self):
+        """False for archives sealed before segments recorded their chain file ranges."""
+        return all("log_digest" in entry for entry in self.entries)
+
+    def check_log(self, path):
+        """Raise SegmentCorrupt if a segment's lines in the chain file at `path` changed since it was sealed."""
+        for entry in self.entries:
+            start, end = entry["log"]
+            if log_digest(path, start, end) != entry["log_digest"]:
+                raise SegmentCorrupt(f"the chain file's lines for {entry['file']} changed after it was sealed")
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def open_segments(root):
+    """The SegmentStore in `root`, or None if there is none (or its manifest is unreadable)."""
+    try:
+        with open(os.path.join(root, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable chain segment manifest in %s: %s", root, e)
+        return None
+    if not manifest.get("segments"):
+        return None
+    return SegmentStore(root, manifest)
+
+
+def seal_segments(root, chain, count, log_end, last_log, indexes):
+    """
+    Seal blocks of `chain` (a CompactChain over the segments in `root`, if any) up
+    to position `count`, which must be a whole number of SEGMENT_BLOCKS past the
+    sealed ones: each new segment file is written, then the manifest is replaced to
+    list them. Only the unsealed blocks are read. Returns False, writing nothing, if
+    the archive no longer ends where `chain` thinks it does. `indexes` maps
+    name -> {key: [pos...]} and is trimmed to positions below `count`.
+    """
+    os.makedirs(root, exist_ok=True)
+    manifest_path = os.path.join(root, MANIFEST)
+    with FileLock(f"{manifest_path}.lock"):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {"segments": [], "count": 0}
+        if manifest["count"] != chain.base_count:
+            # another worker sealed (or the archive was reset) since this chain was loaded
+            return False
+        segments = manifest["segments"]
+        previous_checkpoint = segments[-1]["checkpoint"] if segments else "0" * 64
+        for first in range(chain.base_count, count, SEGMENT_BLOCKS):
+            name = f"seg-{first:012d}.npseg"
+            write_segment(os.path.join(root, name), chain, first, SEGMENT_BLOCKS)
+            hashes = b"".join(bytes(chain.hash_bytes(pos)) for pos in range(first, first + SEGMENT_BLOCKS))
+            previous_checkpoint = checkpoint(previous_checkpoint, hashes)
+            # from the first block's line to the end of the last one's (separators included)
+            log_start = chain.log_location(first)[0]
+            last_offset, last_length = chain.log_location(first + SEGMENT_BLOCKS - 1)
+            log_range = [log_start, last_offset + last_length]
+            segments.append({
+                "file": name,
+                "first": first,
+                "count": SEGMENT_BLOCKS,
+                "last_hash": hashes[-32:].hex(),
+                "checkpoint": previous_checkpoint,
+                "log": log_range,
+                "log_digest": log_digest(chain.path, *log_range)
+            })
+        manifest.update({
+            "count": count,
+            "log_end": log_end,
+            "last_log": list(last_log),
+            "indexes": {
+                name: {key: positions[:bisect.bisect_left(positions, count)] for key, positions in index.items()}
+                for name, index in indexes.items()
+            },
+            "segments": segments
+        })
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+    return True
@@ -0,0 +1,348 @@
+import json
+import os
+import threading
+from array import array
+
+# ---------------------------
+# On-disk layout
+# ---------------------------
+# blockchain.json stays a valid JSON array, but is written one block per line with
+# the separating comma at the start of the line:
+#
+#   [
+#   {"index": 1, ...}
+#   ,{"index": 2, ...}
+#   ]
+#
+# so appending a block is "seek to the closing bracket, write ',{block}\n]\n'" and
+# any block's data can be re-read later from its (offset, length) in the file.
+HASH_SIZE = 32
+ZERO_HASH = bytes(HASH_SIZE)
+HEADER = b"[\n"
+FOOTER = b"]\n"
+
+
+def hash_to_bytes(value):
+    """64-char hex digest -> 32 bytes. The genesis block's previous_hash "0" maps to zeros."""
+    if not value or value == "0":
+        return ZERO_HASH
+    return bytes.fromhex(value)
+
+
+def bytes_to_hash(value):
+    return "0" if value == ZERO_HASH else value.hex()
+
+
+# Every line is written with its keys in this order (unknown keys last), so a block
+# encodes to the same bytes whether it comes from block_hash.seal() (which adds
+# hash last) or from BlockRecord.to_dict(): rewriting unchanged history must not
+# change the sealed byte ranges app.chain_segments checks.
+KEY_ORDER = {key: i for i, key in enumerate(
+    ("index", "timestamp", "data", "previous_hash", "proof", "hash", "version", "data_digest"))}
+
+
+def encode_block(block):
+    ordered = {key: block[key] for key in sorted(block, key=lambda key: KEY_ORDER.get(key, len(KEY_ORDER)))}
+    return json.dumps(ordered, separators=(",", ":")).encode()
+
+
+# ---------------------------
+# Block records
+# ---------------------------
+class BlockRecord:
+    """
+    Lightweight view of one block, built on access from the chain's columns. Supports
+    the read-only dict access the routes use (block["hash"], block.get("data")); `data`
+    is read from disk the first time it is asked for. Use to_dict() for JSON responses.
+    Version 2 blocks (see app.block_hash) also have "version" and "data_digest".
+    """
+    __slots__ = ("_chain", "_pos", "index", "timestamp", "proof", "hash", "previous_hash",
+                 "version", "data_digest", "_data", "_keys")
+
+    KEYS_V1 = ("index", "timestamp", "data", "previous_hash", "proof", "hash")
+    KEYS_V2 = KEYS_V1 + ("version", "data_digest")
+
+    def __init__(self, chain, pos):
+        self._chain = chain
+        self._pos = pos
+        (self.index, self.timestamp, self.proof, hash_bytes, previous_hash_bytes,
+         self.version, digest_bytes) = chain.header(pos)
+        self.hash = bytes_to_hash(hash_bytes)
+        self.previous_hash = bytes_to_hash(previous_hash_bytes)
+        if self.version >= 2:
+            self.data_digest = digest_bytes.hex()
+            self._keys = self.KEYS_V2
+        else:
+            self.data_digest = None
+            self._keys = self.KEYS_V1
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._chain.read_data(self._pos)
+        return self._data
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self._keys:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def keys(self):
+        return list(self._keys)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self._keys}
+
+    def __repr__(self):
+        return f"BlockRecord(index={self.index}, hash={self.hash[:12]}...)"
+
+
+# ---------------------------
+# Column store
+# ---------------------------
+class CompactChain:
+    """
+    The chain held as columns: array-backed index/timestamp/proof/version, 32-byte
+    binary hashes and data digests packed into bytearrays, and the (offset, length) of each block's line in
+    the chain file so `data` never has to stay resident. Behaves like a read-only
+    sequence of BlockRecord.
+
+    With a `base` (app.chain_segments.SegmentStore) the first base.count blocks are
+    served from the sealed segments and the columns only hold the tail appended
+    after them.
+    """
+
+    def __init__(self, path, base=None):
+        self.path = path
+        self.base = base
+        self.base_count = base.count if base is not None else 0
+        self.indexes = array("q")
+        self.timestamps = array("d")
+        self.proofs = array("q")
+        self.hashes = bytearray()
+        self.previous_hashes = bytearray()
+        self.versions = array("b")
+        self.data_digests = bytearray()  # zeros for version 1 blocks
+        self.offsets = array("q")
+        self.lengths = array("q")
+        self._fh = None
+        self._io_lock = threading.Lock()
+
+    def __len__(self):
+        return self.base_count + len(self.indexes)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [BlockRecord(self, i) for i in range(*pos.indices(len(self)))]
+        n = len(self)
+        if pos < 0:
+            pos += n
+        if not 0 <= pos < n:
+            raise IndexError("chain index out of range")
+        return BlockRecord(self, pos)
+
+    def __iter__(self):
+        for pos in range(len(self)):
+            yield BlockRecord(self, pos)
+
+    def __reversed__(self):
+        for pos in range(len(self) - 1, -1, -1):
+            yield BlockRecord(self, pos)
+
+    def append(self, block, offset, length):
+        version = int(block.get("version", 1))
+        digest = bytes.fromhex(block["data_digest"]) if version >= 2 else ZERO_HASH
+        self.append_raw(int(block["index"]), float(block["timestamp"]), int(block["proof"]),
+                        hash_to_bytes(block["hash"]), hash_to_bytes(block["previous_hash"]),
+                        version, digest, offset, length)
+
+    def append_raw(self, index, timestamp, proof, hash_bytes, previous_hash_bytes, version, digest_bytes,
+                   offset, length):
+        self.indexes.append(index)
+        self.timestamps.append(timestamp)
+        self.proofs.append(proof)
+        self.hashes += hash_bytes
+        self.previous_hashes += previous_hash_bytes
+        self.versions.append(version)
+        self.data_digests += digest_bytes
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def header(self, pos):
+        """
+        (index, timestamp, proof, hash bytes, previous_hash bytes, version, data_digest
+        bytes) of the block at `pos`.
+        """
+        if pos < self.base_count:
+            return self.base.header(pos)
+        i = pos - self.base_count
+        span = slice(i * HASH_SIZE, (i + 1) * HASH_SIZE)
+        return (self.indexes[i], self.timestamps[i], self.proofs[i], bytes(self.hashes[span]),
+                bytes(self.previous_hashes[span]), self.versions[i], bytes(self.data_digests[span]))
+
+    def hash_bytes(self, pos):
+        if pos < self.base_count:
+            return self.base.hash_bytes(pos)
+        i = pos - self.base_count
+        return bytes(self.hashes[i * HASH_SIZE:(i + 1) * HASH_SIZE])
+
+    def hash_at(self, pos):
+        return bytes_to_hash(self.hash_bytes(pos))
+
+    def find(self, block_hash):
+        """Position of the block with hex hash `block_hash`, or -1."""
+        try:
+            needle = hash_to_bytes(block_hash)
+        except ValueError:
+            return -1
+        start = 0
+        while True:
+            pos = self.hashes.find(needle, start)
+            if pos < 0:
+                break
+            if pos % HASH_SIZE == 0:
+                return self.base_count + pos // HASH_SIZE
+            start = pos + 1
+        return self.base.find(needle) if self.base is not None else -1
+
+    def log_location(self, pos):
+        """(offset, length) of the block's line in the chain file, if known."""
+        if pos >= self.base_count:
+            i = pos - self.base_count
+            return self.offsets[i], self.lengths[i]
+        if pos == self.base_count - 1:
+            return self.base.last_log_offset, self.base.last_log_length
+        return None
+
+    def read_log_block(self, pos):
+        """Full block dict for `pos`, parsed from its line in the chain file."""
+        offset, length = self.log_location(pos)
+        with self._io_lock:
+            if self._fh is None:
+                # unbuffered: a buffered reader would serve stale bytes for regions
+                # rewritten in place by later appends (the old closing bracket)
+                self._fh = open(self.path, "rb", buffering=0)
+            self._fh.seek(offset)
+            raw = self._fh.read(length)
+        return json.loads(raw)
+
+    def read_data(self, pos):
+        if pos < self.base_count:
+            return self.base.data(pos)
+        return self.read_log_block(pos).get("data")
+
+    def close(self):
+        """Drop the chain file handle (the file may since have been replaced)."""
+        with self._io_lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def release(self):
+        self.close()
+        if self.base is not None:
+            self.base.close()
+
+    def to_list(self):
+        """Every block in the original dict shape, for JSON responses."""
+        return [record.to_dict() for record in self]
+
+
+# ---------------------------
+# Chain file I/O
+# ---------------------------
+class LegacyFormat(Exception):
+    """The chain file is a pretty-printed JSON array from before the one-block-per-line layout."""
+
+
+def scan_chain_file(chain, start=0, on_block=None):
+    """
+    Read block lines from byte offset `start` (0 = whole file), appending them to
+    `chain` and calling on_block(pos, block_dict) for each. Returns the offset of the
+    closing bracket, which is where the next append goes. A torn last line from an
+    interrupted append is ignored.
+    """
+    offset = start
+    end = start
+    with open(chain.path, "rb") as f:
+        f.seek(start)
+        for line in f:
+            line_len = len(line)
+            body = line.rstrip(b"\r\n")
+            if body.startswith(b","):
+                body_offset, body = offset + 1, body[1:]
+            else:
+                body_offset = offset
+            if body.startswith(b"{"):
+                try:
+                    block = json.loads(body)
+                except ValueError:
+                    if len(chain) == 0:
+                        raise LegacyFormat(chain.path)
+                    break
+                chain.append(block, body_offset, len(body))
+                if on_block is not None:
+                    on_block(len(chain) - 1, block)
+                end = offset + line_len
+            elif body.strip() in (b"[", b""):
+                end = offset + line_len
+            elif body.strip() == b"]":
+                end = offset
+                break
+            else:
+                if len(chain) == 0:
+                    raise LegacyFormat(chain.path)
+                break
+            offset += line_len
+    return end
+
+
+def write_chain_file(path, blocks):
+    """Write `blocks` (dicts or BlockRecords) as a fresh chain file, atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER)
+        for i, block in enumerate(blocks):
+            if isinstance(block, BlockRecord):
+                block = block.to_dict()
+            f.write((b"," if i else b"") + encode_block(block) + b"\n")
+        f.write(FOOTER)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def append_chain_file(path, end, blocks, fsync=True):
+    """
+    Append `blocks` (dicts) at offset `end` (the closing bracket) in a single write.
+    Returns the (offset, length) of each new line and the new end offset.
+    """
+    placements = []
+    chunks = []
+    offset = end
+    for block in blocks:
+        encoded = encode_block(block)
+        chunks.append(b"," + encoded + b"\n")
+        placements.append((offset + 1, len(encoded)))
+        offset += len(encoded) + 2
+    with open(path, "r+b") as f:
+        f.seek(end)
+        f.write(b"".join(chunks) + FOOTER)
+        f.truncate()
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    return placements, offset
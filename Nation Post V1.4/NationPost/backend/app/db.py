@@ -0,0 +1,27 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+# ---------------------------
+# Shared MongoDB client, created on first use
+# ---------------------------
+# pymongo is imported lazily too so app startup doesn't pay for it (or for
+# dnspython resolving an SRV record) before the first request that needs users.
+load_dotenv()
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from pymongo import MongoClient
+                _client = MongoClient(os.getenv("MONGODB_URI"))
+    return _client
+
+
+def get_users_collection():
+    return get_client().authDB.users
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from app.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Upload fingerprints
+# ---------------------------
+# data/dedup_index.json keeps, for every article uploaded through upload_news:
+#   files      sha256 of each uploaded file -> the CID Pinata gave it
+#   articles   exact fingerprint (normalised text + file hashes) -> the block and
+#              CIDs the upload produced, and its verification result
+#   simhash    64-bit SimHash of title + description -> the same article, for
+#              spotting near-duplicates (reworded or re-punctuated resubmissions)
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "data/dedup_index.json")
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "6"))
+
+SIMHASH_BITS = 64
+# 8 bands of 8 bits: two fingerprints within 7 bits of each other agree on at least one
+# band, so candidates are found by band lookups (distances above 7 may be missed)
+BANDS = 8
+BAND_BITS = SIMHASH_BITS // BANDS
+CHUNK_SIZE = 256 * 1024
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text):
+    return _WORD_RE.findall((text or "").lower())
+
+
+def file_sha256(stream):
+    """SHA-256 of a seekable upload stream, left rewound for the next reader."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def article_fingerprint(title, description, category, source, file_hashes):
+    """Exact-duplicate key: case/whitespace/punctuation-insensitive text plus the file contents."""
+    parts = [" ".join(_words(title)), " ".join(_words(description)),
+             " ".join(_words(category)), " ".join(_words(source))]
+    parts.extend(sorted(file_hashes))
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+def simhash(text):
+    """64-bit SimHash over words and word pairs."""
+    words = _words(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return None
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+def _bands(fp):
+    return [f"{i}:{fp >> (i * BAND_BITS) & ((1 << BAND_BITS) - 1)}" for i in range(BANDS)]
+
+
+class DedupIndex:
+    """
+    Persistent fingerprint index shared by every worker: changes are made under a
+    file lock and written atomically, and the file is re-read when another worker
+    has changed it.
+    """
+
+    def __init__(self, path=DEDUP_INDEX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(f"{path}.lock")
+        self._mtime = None
+        self._reset()
+        self._pending = {}  # fingerprint -> [lock held while that article is uploaded, holders + waiters]
+
+    def _reset(self):
+        self.files = {}
+        self.articles = {}
+        self.simhashes = []   # [fingerprint, article key]
+        self._band_index = {}
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                doc = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable dedup index %s: %s", self.path, e)
+            return
+        self._reset()
+        self.files = doc.get("files", {})
+        self.articles = doc.get("articles", {})
+        for fp, key in doc.get("simhash", []):
+            self._add_simhash(fp, key)
+        self._mtime = mtime
+
+    def _add_simhash(self, fp, key):
+        self.simhashes.append([fp, key])
+        for band in _bands(fp):
+            self._band_index.setdefault(band, []).append(len(self.simhashes) - 1)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.files, "articles": self.articles, "simhash": self.simhashes},
+                      f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    # -- lookups --
+    def known_file(self, sha256):
+        """CID a file with this content was already pinned as, or None."""
+        with self._lock:
+            self._refresh()
+            return self.files.get(sha256)
+
+    def exact(self, fingerprint):
+        with self._lock:
+            self._refresh()
+            return self.articles.get(fingerprint)
+
+    def near(self, fp, max_distance=NEAR_DUPLICATE_DISTANCE):
+        """(article record, Hamming distance) of the closest indexed SimHash within `max_distance`, or None."""
+        if fp is None:
+            return None
+        with self._lock:
+            self._refresh()
+            best = None
+            for band in _bands(fp):
+                for i in self._band_index.get(band, ()):
+                    other, key = self.simhashes[i]
+                    distance = bin(fp ^ other).count("1")
+                    if distance <= max_distance and (best is None or distance < best[1]):
+                        best = (self.articles.get(key), distance)
+            return best if best is not None and best[0] is not None else None
+
+    def uploading(self, fingerprint):
+        """
+        Wait for, then take, the lock on uploading the article with this fingerprint,
+        so an identical upload arriving meanwhile (in this process) waits and then
+        finds the first one's record instead of mining a second copy. Every call must
+        be paired with done(), whether the upload succeeded or not.
+        """
+        with self._lock:
+            entry = self._pending.setdefault(fingerprint, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+
+    def done(self, fingerprint):
+        """Release the uploading() lock; the entry is dropped once nobody holds or waits for it."""
+        with self._lock:
+            entry = self._pending[fingerprint]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._pending[fingerprint]
+        entry[0].release()
+
+    # -- updates --
+    def record(self, fingerprint, fp, article, file_hashes):
+        """Remember an uploaded article: `file_hashes` maps file sha256 -> CID."""
+        with self._lock, self._file_lock:
+            self._refresh()
+            self.files.update(file_hashes)
+            self.articles[fingerprint] = article
+            if fp is not None:
+                self._add_simhash(fp, fingerprint)
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning("Could not write dedup index %s: %s", self.path, e)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_dedup_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DedupIndex()
+    return _index
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# In-process fan-out for server-sent events
+# ---------------------------
+# One Broadcaster per process. Each event is encoded to an SSE frame once and the
+# same bytes are handed to every subscriber's queue, so N open streams cost one
+# encode plus N queue puts per block, not N chain scans.
+SUBSCRIBER_QUEUE_SIZE = 256
+# How often (seconds) to look for blocks other workers appended while anyone is listening
+WATCH_INTERVAL = float(os.getenv("CHAIN_WATCH_INTERVAL", "1"))
+
+
+def sse_frame(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class Broadcaster:
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def subscribe_async(self):
+        """Subscribe from a coroutine: events arrive on the returned subscriber's asyncio `queue`."""
+        subscriber = AsyncSubscriber(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event_id, frame):
+        """Queue (event_id, frame) for every subscriber; ids let streams drop replayed duplicates."""
+        item = (event_id, frame)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(item)
+            except queue.Full:
+                # A client that stopped reading loses events rather than holding up the rest
+                logger.debug("Dropping SSE event for a slow subscriber")
+
+
+class AsyncSubscriber:
+    """Broadcaster subscriber served on an event loop; publish() may run on any thread."""
+
+    def __init__(self, loop, queue_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def put_nowait(self, item):
+        try:
+            self.loop.call_soon_threadsafe(self._put, item)
+        except RuntimeError:
+            # loop closed (shutdown); the stream is gone with it
+            pass
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logger.debug("Dropping SSE event for a slow subscriber")
+
+
+class ChainWatcher:
+    """
+    Background thread that reloads the chain every WATCH_INTERVAL seconds while there
+    are subscribers, so blocks committed by other worker processes reach this
+    process's listeners too.
+    """
+
+    def __init__(self, manager, broadcaster, interval=WATCH_INTERVAL):
+        self.manager = manager
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        """Start the thread if it isn't running; call after subscribing."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chain-watcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # decided under the lock: a subscriber that finds the thread still set is
+            # already counted here, one that doesn't starts a new thread
+            with self._lock:
+                if not self.broadcaster.subscriber_count:
+                    self._thread = None
+                    return
+            try:
+                self.manager.reload()
+            except Exception as e:
+                logger.warning("Chain watcher reload failed: %s", e)
+            time.sleep(self.interval)
@@ -0,0 +1,59 @@
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on `path`, shared by every process (gunicorn worker) that
+    opens the same file. Re-entrant within the owning thread; callers serialise
+    threads themselves.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+        self._depth = 0
+
+    def acquire(self):
+        if self._depth == 0:
+            fh = open(self.path, "a+b")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                else:
+                    fh.seek(0)
+                    # LK_LOCK retries for ~10 s before raising; keep trying until we get it
+                    while True:
+                        try:
+                            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue
+            except BaseException:
+                fh.close()
+                raise
+            self._fh = fh
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fh, self._fh = self._fh, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                else:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                fh.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,249 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from app import aio
+from app.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Configuration
+# ---------------------------
+# Comma-separated gateway base URLs; objects are fetched from <base>/ipfs/<cid>.
+# Point this at a local gateway (or the benchmark stub server) to keep tests offline.
+IPFS_GATEWAYS = [
+    g.strip().rstrip("/")
+    for g in os.getenv("IPFS_GATEWAYS", "https://gateway.pinata.cloud,https://ipfs.io,https://dweb.link").split(",")
+    if g.strip()
+]
+
+MIN_TIMEOUT = float(os.getenv("GATEWAY_MIN_TIMEOUT", "2"))
+MAX_TIMEOUT = float(os.getenv("GATEWAY_MAX_TIMEOUT", "15"))
+CONNECT_TIMEOUT = 5
+
+SAMPLE_WINDOW = 50        # recent latencies kept per gateway
+MIN_SAMPLES = 5           # below this the timeout stays at MAX_TIMEOUT
+TIMEOUT_FACTOR = 3        # timeout = p95 latency x this, clamped to [MIN, MAX]
+ERROR_DECAY = 0.2         # weight of the newest outcome in the error-rate EWMA
+FAILURE_THRESHOLD = 3     # consecutive failures that open the circuit
+COOLDOWN = 30.0           # first open period in seconds, doubled per re-open
+MAX_COOLDOWN = 300.0
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class GatewayHealth:
+    """Latency samples, error rate and circuit state of one gateway."""
+
+    def __init__(self, base):
+        self.base = base
+        self.latencies = deque(maxlen=SAMPLE_WINDOW)
+        self.error_rate = 0.0
+        self.failures = 0        # consecutive
+        self.open_until = 0.0    # circuit open until this monotonic time
+        self.cooldown = COOLDOWN
+        self.probing = 0.0       # when the last half-open trial request was handed out
+
+    def url(self, cid):
+        return f"{self.base}/ipfs/{cid}"
+
+    def timeout(self):
+        if len(self.latencies) < MIN_SAMPLES:
+            return MAX_TIMEOUT
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, percentile(self.latencies, 0.95) * TIMEOUT_FACTOR))
+
+    def score(self):
+        """Expected cost of trying this gateway; lower is better."""
+        p50 = percentile(self.latencies, 0.5)
+        return (p50 if p50 is not None else 1.0) * (1 + 4 * self.error_rate)
+
+    def to_dict(self, now):
+        p50 = percentile(self.latencies, 0.5)
+        p95 = percentile(self.latencies, 0.95)
+        return {
+            "gateway": self.base,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "timeout_s": round(self.timeout(), 2),
+            "circuit": "open" if self.open_until > now else "closed",
+            "samples": len(self.latencies)
+        }
+
+
+class GatewayClient:
+    """
+    Shared IPFS gateway client. Every fetch feeds per-gateway latency and error
+    stats; attempts are ordered by observed health, each gateway gets a timeout
+    derived from its own recent p95, and a gateway that keeps failing is skipped
+    (circuit open) until its cooldown passes and a single trial request succeeds.
+    """
+
+    def __init__(self, gateways=None):
+        self.gateways = [GatewayHealth(g) for g in (gateways or IPFS_GATEWAYS)]
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.gateways)),
+                                        thread_name_prefix="gateway")
+
+    # -- health --
+    def ordered(self):
+        """
+        Gateways worth trying now, healthiest first. A gateway whose circuit is open
+        is left out; once its cooldown has passed it is half-open and one request
+        at a time may try it.
+        """
+        now = time.monotonic()
+        chosen = []
+        with self._lock:
+            for g in sorted(self.gateways, key=GatewayHealth.score):
+                if g.open_until > now:
+                    continue
+                if g.failures >= FAILURE_THRESHOLD:
+                    if now - g.probing < MAX_TIMEOUT:
+                        continue
+                    g.probing = now
+                chosen.append(g)
+        return chosen
+
+    def record_success(self, g, elapsed):
+        with self._lock:
+            g.latencies.append(elapsed)
+            g.error_rate *= 1 - ERROR_DECAY
+            g.failures = 0
+            g.cooldown = COOLDOWN
+            g.open_until = 0.0
+
+    def record_failure(self, g, reason):
+        with self._lock:
+            g.error_rate = g.error_rate * (1 - ERROR_DECAY) + ERROR_DECAY
+            g.failures += 1
+            now = time.monotonic()
+            # requests already in flight when the circuit opened don't extend it
+            if g.failures >= FAILURE_THRESHOLD and g.open_until <= now:
+                if g.open_until:
+                    # the half-open trial failed
+                    g.cooldown = min(MAX_COOLDOWN, g.cooldown * 2)
+                g.open_until = now + g.cooldown
+                logger.warning("Gateway %s circuit open for %.0f s after %d failures (%s)",
+                               g.base, g.cooldown, g.failures, reason)
+        logger.debug("Gateway %s failed: %s", g.base, reason)
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return [g.to_dict(now) for g in sorted(self.gateways, key=GatewayHealth.score)]
+
+    # -- requests --
+    def _get(self, g, cid, stream=False):
+        """One attempt. Returns the 200 response, or None after recording why not."""
+        started = time.perf_counter()
+        try:
+            with span("gateway_fetch"):
+                r = requests.get(g.url(cid), stream=stream, timeout=(min(CONNECT_TIMEOUT, g.timeout()), g.timeout()))
+        except requests.RequestException as err:
+            self.record_failure(g, err.__class__.__name__)
+            return None
+        return self._checked(g, cid, r, time.perf_counter() - started)
+
+    async def _aget(self, g, cid):
+        """_get on the shared event loop (see app.aio)."""
+        started = time.perf_counter()
+        try:
+            with span("gateway_fetch"):
+                r = await aio.get_http().get(g.url(cid), timeout=(min(CONNECT_TIMEOUT, g.timeout()), g.timeout()))
+        except requests.RequestException as err:
+            self.record_failure(g, err.__class__.__name__)
+            return None
+        return self._checked(g, cid, r, time.perf_counter() - started)
+
+    def _checked(self, g, cid, r, elapsed):
+        if r.status_code == 200:
+            self.record_success(g, elapsed)
+            return r
+        if r.status_code == 429 or r.status_code >= 500:
+            self.record_failure(g, f"status {r.status_code}")
+        else:
+            # the gateway answered, it just doesn't have (or refuses) this CID
+            self.record_success(g, elapsed)
+            logger.debug("Gateway %s returned status %s for %s", g.base, r.status_code, cid)
+        r.close()
+        return None
+
+    def fetch_json(self, cid, fallback_url=None):
+        """
+        Decoded JSON document for `cid` from the first gateway that serves it, trying
+        the healthiest first; `fallback_url` (a block's own ipfs_url outside the
+        configured gateways) is tried last. None if nothing answers.
+        """
+        return aio.run(self.afetch_json(cid, fallback_url))
+
+    async def afetch_json(self, cid, fallback_url=None):
+        """fetch_json as a coroutine on the shared event loop."""
+        for g in self.ordered():
+            r = await self._aget(g, cid)
+            if r is None:
+                continue
+            try:
+                return r.json()
+            except ValueError as err:
+                logger.debug("Failed to parse JSON from %s: %s", g.url(cid), err)
+        if fallback_url and not any(fallback_url.startswith(g.base + "/") for g in self.gateways):
+            try:
+                with span("gateway_fetch"):
+                    r = await aio.get_http().get(fallback_url, timeout=MAX_TIMEOUT)
+                if r.status_code == 200:
+                    return r.json()
+            except (requests.RequestException, ValueError) as err:
+                logger.debug("Request error from %s: %s", fallback_url, err)
+        logger.info("Metadata fetch failed for CID %s on every gateway", cid)
+        return None
+
+    def fetch_json_many(self, items):
+        """fetch_json for many (cid, fallback_url) pairs at once, concurrently; results in order."""
+        return aio.run_all(self.afetch_json(cid, url) for cid, url in items)
+
+    def open_stream(self, cid):
+        """
+        Race every available gateway for `cid` with streaming requests. Returns the
+        first 200 response (caller reads and closes it); the others are closed as
+        they arrive. None if no gateway has it.
+        """
+        futures = [self._pool.submit(contextvars.copy_context().run, self._get, g, cid, True)
+                   for g in self.ordered()]
+        winner = None
+        try:
+            for future in as_completed(futures):
+                winner = future.result()
+                if winner is not None:
+                    break
+        finally:
+            def _close_loser(f, keep=winner):
+                r = f.result()
+                if r is not None and r is not keep:
+                    r.close()
+            for future in futures:
+                future.add_done_callback(_close_loser)
+        return winner
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gateway_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GatewayClient()
+    return _client
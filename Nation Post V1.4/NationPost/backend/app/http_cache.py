@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import g, make_response, request
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used when it isn't installed
+    brotli = None
+
+# ---------------------------
+# Chain-tip HTTP caching
+# ---------------------------
+# Views decorated with @tip_cached return the same body for as long as the chain
+# tip doesn't move, so their responses are keyed on (endpoint, query params, tip):
+#   - the ETag is derived from that key alone, so an If-None-Match poll is answered
+#     304 without running the view (and agrees across workers at the same tip)
+#   - the serialised body, and its compressed forms once asked for, are kept in a
+#     small LRU, so a repeat request is a dictionary lookup
+# Bodies of HTTP_COMPRESS_MIN_BYTES or more are sent br (if brotli is installed)
+# or gzip-encoded to clients that accept it.
+HTTP_CACHE_ENTRIES = int(os.getenv("HTTP_CACHE_ENTRIES", "64"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+HTTP_COMPRESS_MIN_BYTES = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _negotiate(body_size):
+    """Content-Encoding to send a body of `body_size` bytes with, or None."""
+    if body_size < HTTP_COMPRESS_MIN_BYTES:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+class PayloadCache:
+    """LRU of serialised response bodies, bounded by entry count and total bytes."""
+
+    def __init__(self, max_entries=HTTP_CACHE_ENTRIES, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> {"mimetype", None: body, "gzip": ..., "br": ...}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, mimetype):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = {"mimetype": mimetype, None: body}
+            self._bytes += len(body)
+            self._trim()
+
+    def encoded(self, key, entry, encoding):
+        """The entry's body in `encoding`, compressing it on first use."""
+        body = entry.get(encoding)
+        if body is None:
+            body = _compress(entry[None], encoding)
+            with self._lock:
+                if encoding not in entry:
+                    entry[encoding] = body
+                    if key in self._entries:
+                        self._bytes += len(body)
+                        self._trim()
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _trim(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= sum(len(v) for k, v in entry.items() if k != "mimetype")
+
+
+_cache = PayloadCache()
+
+
+def no_store():
+    """Keep the current response out of the cache (e.g. it holds a fallback for a failed fetch)."""
+    g.http_cache_no_store = True
+
+
+def _etag_matches(etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def _send(etag, body, mimetype, encoding):
+    response = make_response(body, 200)
+    response.mimetype = mimetype
+    if etag:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def tip_cached(view):
+    """Serve `view` (a GET view whose output only changes with the chain) with ETags, compression and caching."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from app.blockchain_manager import get_manager
+        manager = get_manager()
+        try:
+            manager.reload()
+        except Exception:
+            pass
+        chain = manager.chain
+        tip = (len(chain), chain[-1]["hash"] if len(chain) else "")
+        key = (request.endpoint, tuple(sorted(kwargs.items())),
+               tuple(sorted(request.args.items(multi=True))), tip)
+        etag = '"%s"' % hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+
+        if _etag_matches(etag):
+            response = make_response("", 304)
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        entry = _cache.get(key)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+            body = response.get_data()
+            if g.pop("http_cache_no_store", False):
+                # sent compressed but without an ETag, so it is never revalidated into a 304
+                encoding = _negotiate(len(body))
+                return _send(None, _compress(body, encoding) if encoding else body, response.mimetype, encoding)
+            _cache.put(key, body, response.mimetype)
+            entry = _cache.get(key) or {"mimetype": response.mimetype, None: body}
+
+        encoding = _negotiate(len(entry[None]))
+        body = _cache.encoded(key, entry, encoding) if encoding else entry[None]
+        return _send(etag, body, entry["mimetype"], encoding)
+
+    return wrapper
@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Configuration
+# ---------------------------
+load_dotenv()
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "15"))              # sustained requests per minute
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "5"))             # requests allowed back to back
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4"))  # requests in flight at once
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", "20"))    # seconds a caller waits in total
+GEMINI_BATCH_MAX = int(os.getenv("GEMINI_BATCH_MAX", "8"))     # claims per prompt when queued up
+RETRIES = 2
+BACKOFF = 1.0
+
+# google.generativeai is slow to import, so it is pulled in on first use
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def _get_genai():
+    """Import and configure the Gemini SDK once; raises if no API key is set."""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                if not GEMINI_API_KEY:
+                    raise ValueError("Please set GEMINI_API_KEY in your .env file")
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+
+# ---------------------------
+# Prompts
+# ---------------------------
+def single_prompt(claim):
+    evidence_text = "\n".join(f"- {title}" for title in claim["evidence"])
+    return f"""
+    Headline: {claim["headline"]}
+    Description: {claim["description"]}
+
+    Evidence from reputable sources:
+    {evidence_text}
+
+    Based on this evidence, decide if the news is REAL or FAKE.
+    Respond in JSON format:
+    {{
+        "prediction": "REAL or FAKE",
+        "confidence": "0-100",
+        "reason": "Short explanation"
+    }}
+    """
+
+
+def batch_prompt(claims):
+    parts = []
+    for n, claim in enumerate(claims, 1):
+        evidence_text = "\n".join(f"    - {title}" for title in claim["evidence"])
+        parts.append(f"""
+    Claim {n}:
+    Headline: {claim["headline"]}
+    Description: {claim["description"]}
+    Evidence from reputable sources:
+{evidence_text}
+""")
+    return "".join(parts) + f"""
+    Based on its own evidence only, decide for each of the {len(claims)} claims above
+    whether the news is REAL or FAKE.
+    Respond with a JSON array of {len(claims)} objects, one per claim, in claim order:
+    [
+        {{
+            "prediction": "REAL or FAKE",
+            "confidence": "0-100",
+            "reason": "Short explanation"
+        }}
+    ]
+    """
+
+
+def parse_gemini_response_as_dict(response_text):
+    """Extract JSON from Gemini response text and return as dict."""
+    try:
+        match = re.search(r"\{.*\}", response_text, re.DOTALL)
+        if match:
+            return json.loads(match.group())
+        else:
+            return {"prediction": "UNKNOWN", "confidence": 0, "reason": response_text}
+    except json.JSONDecodeError:
+        return {"prediction": "UNKNOWN", "confidence": 0, "reason": response_text}
+
+
+def parse_batch_response(response_text, count):
+    """List of `count` result dicts from a batch answer, or None if it doesn't have that shape."""
+    match = re.search(r"\[.*\]", response_text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        results = json.loads(match.group())
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(results, list) or len(results) != count or not all(isinstance(r, dict) for r in results):
+        return None
+    return results
+
+
+def unknown(reason):
+    return {"prediction": "UNKNOWN", "confidence": 0, "reason": reason}
+
+
+# ---------------------------
+# Admission control
+# ---------------------------
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate            # tokens per second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline):
+        """Take one token, waiting for it if need be; False if it can't come before `deadline`."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class LLMGateway:
+    """
+    Single entry point for Gemini fact-checks. Callers block for at most their
+    deadline and get an "UNKNOWN" verdict if it passes. Behind it: one reusable
+    model client, a token bucket (GEMINI_RPM / GEMINI_BURST), at most
+    GEMINI_CONCURRENCY requests in flight, retries with backoff, and
+    micro-batching: when claims queue up behind a full set of in-flight requests,
+    the next request carries up to GEMINI_BATCH_MAX of them in one prompt.
+
+    Only claims from the same (authenticated) submitter share a prompt: a claim's
+    text could otherwise steer the verdicts of other users' claims, and those
+    verdicts end up on the chain. Claims without a submitter are never batched.
+    """
+
+    def __init__(self, model_factory=None, rpm=GEMINI_RPM, burst=GEMINI_BURST,
+                 concurrency=GEMINI_CONCURRENCY, batch_max=GEMINI_BATCH_MAX):
+        self._model_factory = model_factory or (lambda: _get_genai().GenerativeModel(GEMINI_MODEL))
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._bucket = TokenBucket(rpm / 60.0, burst)
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gemini")
+        self.batch_max = max(1, batch_max)
+        self._queue = queue.Queue()
+        self._held = deque()  # claims the dispatcher took off the queue but couldn't batch yet
+        self._dispatcher = None
+        self._dispatcher_lock = threading.Lock()
+
+    def check(self, headline, description, evidence_titles, timeout=GEMINI_DEADLINE, submitter=None):
+        """
+        Verdict dict (prediction, confidence, reason) for one claim, within `timeout`
+        seconds. `submitter` (an authenticated user id) lets the claim share a prompt
+        with that user's other queued claims.
+        """
+        claim = {
+            "headline": headline,
+            "description": description,
+            "evidence": list(evidence_titles),
+            "submitter": submitter,
+            "solo": submitter is None,
+            "deadline": time.monotonic() + timeout,
+            "future": Future()
+        }
+        self._ensure_dispatcher()
+        self._queue.put(claim)
+        try:
+            return claim["future"].result(timeout=timeout)
+        except FutureTimeout:
+            logger.warning("Gemini verdict not ready within %.1f s", timeout)
+            return unknown(f"Verification timed out after {timeout:g} s")
+
+    def _ensure_dispatcher(self):
+        with self._dispatcher_lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch, name="gemini-dispatch", daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch(self):
+        while True:
+            first = self._held.popleft() if self._held else self._queue.get()
+            # wait for a free slot; the same submitter's claims arriving meanwhile are batched with this one
+            self._slots.acquire()
+            batch = [first]
+            if not first["solo"]:
+                while True:
+                    try:
+                        self._held.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                rest = deque()
+                for claim in self._held:
+                    if len(batch) < self.batch_max and not claim["solo"] and claim["submitter"] == first["submitter"]:
+                        batch.append(claim)
+                    else:
+                        rest.append(claim)
+                self._held = rest
+            self._pool.submit(self._run, batch)
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                self._model = self._model_factory()
+            return self._model
+
+    def _call(self, prompt, deadline):
+        """One generate_content call under the rate limit, retried on failure until `deadline`."""
+        last_error = None
+        for attempt in range(RETRIES + 1):
+            if not self._bucket.acquire(deadline):
+                raise TimeoutError("rate limit leaves no time before the deadline")
+            remaining = deadline - time.monotonic()
+            try:
+                return self._get_model().generate_content(prompt, request_options={"timeout": remaining}).text
+            except ValueError:
+                raise  # configuration problem (e.g. no API key); retrying won't help
+            except Exception as e:
+                last_error = e
+                logger.debug("Gemini call failed (attempt %d): %s", attempt + 1, e)
+                if attempt == RETRIES:
+                    break
+                pause = min(BACKOFF * 2 ** attempt, deadline - time.monotonic())
+                if pause <= 0:
+                    break
+                time.sleep(pause)
+        raise last_error or TimeoutError("deadline passed")
+
+    def _run(self, batch):
+        try:
+            now = time.monotonic()
+            for claim in batch:
+                if claim["deadline"] <= now and not claim["future"].done():
+                    claim["future"].set_result(unknown("Deadline passed before Gemini was free"))
+            batch = [c for c in batch if not c["future"].done()]
+            if len(batch) > 1:
+                try:
+                    text = self._call(batch_prompt(batch), min(c["deadline"] for c in batch))
+                    results = parse_batch_response(text, len(batch))
+                except Exception as e:
+                    logger.debug("Batched Gemini call for %d claims failed: %s", len(batch), e)
+                    results = None
+                if results is not None:
+                    for claim, result in zip(batch, results):
+                        claim["future"].set_result(result)
+                    return
+                # one request per claim, each dispatched to its own slot as slots free up
+                logger.debug("Re-queueing %d claims as one Gemini call each", len(batch))
+                for claim in batch:
+                    claim["solo"] = True
+                    self._queue.put(claim)
+                return
+            for claim in batch:
+                try:
+                    result = parse_gemini_response_as_dict(self._call(single_prompt(claim), claim["deadline"]))
+                except Exception as e:
+                    result = unknown(str(e) or e.__class__.__name__)
+                if not claim["future"].done():
+                    claim["future"].set_result(result)
+        finally:
+            self._slots.release()
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from app.blockchain_manager import block_data
+from app.gateway_client import get_gateway_client
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Content-addressed media cache
+# ---------------------------
+# data/media/<cid[:2]>/<cid>            the object as served by the gateway
+# data/media/<cid[:2]>/<cid>.json       {"content_type": ...}
+# data/media/<cid[:2]>/<cid>.w320.jpg   downscaled thumbnail variants (needs Pillow)
+#
+# A CID names immutable content, so a cached file never goes stale; the cache is only
+# bounded by size, dropping the least recently served files first (mtime is bumped on
+# every hit).
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "data/media")
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+THUMBNAIL_WIDTHS = (160, 320, 640)
+
+CHUNK_SIZE = 256 * 1024
+TOUCH_INTERVAL = 60
+
+CID_RE = re.compile(r"^[A-Za-z0-9]{32,100}$")
+
+
+def is_cid(value):
+    return bool(value) and bool(CID_RE.match(value))
+
+
+def _load_pil():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+class MediaCache:
+    def __init__(self, root=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES, client=None):
+        # absolute, since Flask's send_file resolves relative paths against the app package
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.client = client or get_gateway_client()
+        self._total = None  # bytes on disk, counted on first use
+        self._size_lock = threading.Lock()
+        self._locks = {}  # cid -> [lock, number of threads holding or waiting for it]
+        self._locks_lock = threading.Lock()
+
+    # -- paths --
+    def path_for(self, cid, suffix=""):
+        return os.path.join(self.root, cid[:2], cid + suffix)
+
+    def _meta(self, cid):
+        try:
+            with open(self.path_for(cid, ".json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _cid_lock(self, cid):
+        """Hold the per-CID lock; the entry is dropped once nobody holds or waits for it."""
+        with self._locks_lock:
+            entry = self._locks.setdefault(cid, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[cid]
+
+    def _touch(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    # -- lookups --
+    def lookup(self, cid):
+        """(path, content type) if `cid` is already cached, else None."""
+        path = self.path_for(cid)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path, self._meta(cid).get("content_type") or "application/octet-stream"
+
+    def get(self, cid):
+        """(path, content type) for `cid`, fetching it from the gateways on a miss; None if none has it."""
+        entry = self.lookup(cid)
+        if entry is not None:
+            return entry
+        with self._cid_lock(cid):
+            # another request may have fetched it while we waited
+            entry = self.lookup(cid)
+            if entry is None and self._fetch(cid):
+                entry = self.lookup(cid)
+        return entry
+
+    def _fetch(self, cid):
+        r = self.client.open_stream(cid)
+        if r is None:
+            logger.info("Media fetch failed for CID %s on every gateway", cid)
+            return False
+        path = self.path_for(cid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        size = 0
+        try:
+            with r, open(tmp_path, "wb") as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f"{cid} is larger than the media cache")
+                    f.write(chunk)
+            with open(self.path_for(cid, ".json"), "w") as f:
+                json.dump({"content_type": r.headers.get("Content-Type", "application/octet-stream")}, f)
+            os.replace(tmp_path, path)
+        except Exception as err:
+            logger.warning("Could not cache media %s: %s", cid, err)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self._added(size)
+        return True
+
+    # -- thumbnails --
+    def variant(self, cid, width):
+        """
+        Path of a JPEG no wider than `width` (rounded up to one of THUMBNAIL_WIDTHS),
+        made from the cached original once. None if the original is not an image or
+        Pillow is not installed.
+        """
+        entry = self.lookup(cid)
+        if entry is None or not entry[1].startswith("image/"):
+            return None
+        width = next((w for w in THUMBNAIL_WIDTHS if w >= width), THUMBNAIL_WIDTHS[-1])
+        path = self.path_for(cid, f".w{width}.jpg")
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+        Image = _load_pil()
+        if Image is None:
+            return None
+        with self._cid_lock(cid):
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    with Image.open(entry[0]) as img:
+                        img.thumbnail((width, width * 4))
+                        img.convert("RGB").save(tmp_path, "JPEG", quality=80, optimize=True)
+                    os.replace(tmp_path, path)
+                except Exception as err:
+                    logger.debug("Could not make %spx thumbnail of %s: %s", width, cid, err)
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    return None
+                self._added(os.path.getsize(path))
+        return path
+
+    # -- size bound --
+    def _scan(self):
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".json") or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _added(self, size):
+        with self._size_lock:
+            if self._total is None:
+                self._total = sum(f[1] for f in self._scan())
+            else:
+                self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently served files until the cache is back under 90% of its bound."""
+        files = sorted(self._scan())
+        self._total = sum(f[1] for f in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if self._total <= target:
+                break
+            try:
+                os.remove(path)
+                if os.path.exists(path + ".json"):
+                    os.remove(path + ".json")
+            except OSError:
+                continue
+            self._total -= size
+            logger.debug("Evicted %s from the media cache", path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_media_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MediaCache()
+    return _cache
+
+
+# ---------------------------
+# CIDs the chain refers to
+# ---------------------------
+class ChainMedia:
+    """
+    The media CIDs articles on the chain point at: each block's `thumbnail` and the
+    `files` listed in its metadata document. /media only serves these, so it can't
+    be used to pull arbitrary IPFS content through the API origin (or to fill the
+    cache with it). Blocks are scanned as the chain grows; metadata that isn't
+    cached yet is picked up when the metadata cache receives it. The blocks'
+    metadata CIDs are kept too, for /dashboard/article (has_metadata).
+    """
+
+    def __init__(self, manager=None, metadata_cache=None):
+        if manager is None:
+            from app.blockchain_manager import get_manager
+            manager = get_manager()
+        if metadata_cache is None:
+            from app.metadata_cache import get_metadata_cache
+            metadata_cache = get_metadata_cache()
+        self.manager = manager
+        self.metadata_cache = metadata_cache
+        self._cids = set()
+        self._metadata = set()
+        self._unresolved = set()  # metadata CIDs of scanned blocks whose documents weren't cached
+        self._scanned = 0
+        self._lock = threading.Lock()
+        metadata_cache.add_listener(self._on_metadata)
+
+    def __contains__(self, cid):
+        if cid in self._cids:
+            return True
+        self._scan()
+        return cid in self._cids
+
+    def has_metadata(self, cid):
+        """True if a block on the chain names `cid` as its metadata document."""
+        if cid in self._metadata:
+            return True
+        self._scan()
+        return cid in self._metadata
+
+    def _add_files(self, doc):
+        for f in doc.get("files") or []:
+            if isinstance(f, dict) and f.get("ipfsHash"):
+                self._cids.add(f["ipfsHash"])
+
+    def _on_metadata(self, cid, doc):
+        with self._lock:
+            if cid in self._unresolved:
+                self._unresolved.discard(cid)
+                self._add_files(doc)
+
+    def _scan(self):
+        try:
+            self.manager.reload()
+        except Exception:
+            pass
+        with self._lock:
+            chain = self.manager.chain
+            for pos in range(min(self._scanned, len(chain)), len(chain)):
+                data = block_data(chain[pos])
+                if data.get("thumbnail"):
+                    self._cids.add(data["thumbnail"])
+                metadata_hash = data.get("metadata_hash")
+                if metadata_hash:
+                    self._metadata.add(metadata_hash)
+                    doc = self.metadata_cache.get(metadata_hash)
+                    if doc is None:
+                        self._unresolved.add(metadata_hash)
+                    else:
+                        self._add_files(doc)
+            self._scanned = len(chain)
+
+
+_chain_media = None
+
+
+def get_chain_media():
+    global _chain_media
+    if _chain_media is None:
+        with _cache_lock:
+            if _chain_media is None:
+                _chain_media = ChainMedia()
+    return _chain_media
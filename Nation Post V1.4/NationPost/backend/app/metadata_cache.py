@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.gateway_client import get_gateway_client
+from app.media_cache import TOUCH_INTERVAL, is_cid
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Article metadata cache
+# ---------------------------
+# Metadata documents are addressed by CID and never change, so once fetched they
+# never go stale: the most recent METADATA_CACHE_ENTRIES are kept in memory, and
+# all of them as data/metadata/<cid[:2]>/<cid>.json (a few KB each), bounded by
+# METADATA_CACHE_MAX_BYTES, dropping the least recently read files first (as in
+# app.media_cache). Only CID-shaped keys are stored; /dashboard/article only asks
+# for documents the chain refers to.
+METADATA_CACHE_DIR = os.getenv("METADATA_CACHE_DIR", "data/metadata")
+METADATA_CACHE_ENTRIES = int(os.getenv("METADATA_CACHE_ENTRIES", "2048"))
+METADATA_CACHE_MAX_BYTES = int(os.getenv("METADATA_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+
+
+class MetadataCache:
+    def __init__(self, root=METADATA_CACHE_DIR, max_entries=METADATA_CACHE_ENTRIES,
+                 max_bytes=METADATA_CACHE_MAX_BYTES, client=None):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._total = None  # bytes on disk, counted on first write
+        self._size_lock = threading.Lock()
+        self.client = client or get_gateway_client()
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._fetching = {}
+        # Called with (cid, doc) for every document put here; must be quick and must not raise
+        self._listeners = []
+
+    def path_for(self, cid):
+        return os.path.join(self.root, cid[:2], f"{cid}.json")
+
+    def _remember(self, cid, doc):
+        with self._lock:
+            self._memory[cid] = doc
+            self._memory.move_to_end(cid)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, cid):
+        """Cached document for `cid` (a shallow copy), or None without touching the network."""
+        if not is_cid(cid):
+            return None
+        with self._lock:
+            doc = self._memory.get(cid)
+            if doc is not None:
+                self._memory.move_to_end(cid)
+                return dict(doc)
+        path = self.path_for(cid)
+        try:
+            with open(path) as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        self._remember(cid, doc)
+        return dict(doc)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def put(self, cid, doc):
+        if not is_cid(cid) or not isinstance(doc, dict):
+            return
+        self._remember(cid, doc)
+        for callback in list(self._listeners):
+            try:
+                callback(cid, doc)
+            except Exception as e:
+                logger.warning("Metadata listener %r failed: %s", callback, e)
+        path = self.path_for(cid)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(doc, f, separators=(",", ":"))
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not cache metadata %s: %s", cid, e)
+            return
+        self._added(size)
+
+    def fetch(self, cid, ipfs_url=None):
+        """Cached document for `cid`, fetched through the gateways on a miss; None if unavailable."""
+        if not is_cid(cid):
+            return None
+        doc = self.get(cid)
+        if doc is not None:
+            return doc
+        # one gateway fetch per CID, however many requests ask for it at once
+        with self._lock:
+            lock = self._fetching.setdefault(cid, threading.Lock())
+        with lock:
+            doc = self.get(cid)
+            if doc is None:
+                doc = self.client.fetch_json(cid, ipfs_url)
+                if isinstance(doc, dict):
+                    self.put(cid, doc)
+                    doc = dict(doc)
+        with self._lock:
+            self._fetching.pop(cid, None)
+        return doc
+
+    def fetch_many(self, items):
+        """
+        {cid: document or None} for (cid, ipfs_url) pairs, with all the misses
+        fetched through the gateways concurrently.
+        """
+        docs, missing = {}, {}
+        for cid, ipfs_url in items:
+            if not is_cid(cid) or cid in docs or cid in missing:
+                continue
+            doc = self.get(cid)
+            if doc is not None:
+                docs[cid] = doc
+            else:
+                missing[cid] = ipfs_url
+        if missing:
+            fetched = self.client.fetch_json_many(missing.items())
+            for cid, doc in zip(missing, fetched):
+                if isinstance(doc, dict):
+                    self.put(cid, doc)
+                    doc = dict(doc)
+                docs[cid] = doc
+        return docs
+
+    # -- size bound --
+    def _touch(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _scan(self):
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _added(self, size):
+        with self._size_lock:
+            if self._total is None:
+                self._total = sum(f[1] for f in self._scan())
+            else:
+                self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently read documents until the cache is back under 90% of its bound."""
+        files = sorted(self._scan())
+        self._total = sum(f[1] for f in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if self._total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total -= size
+            logger.debug("Evicted %s from the metadata cache", path)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MetadataCache()
+    return _cache
@@ -0,0 +1,139 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, request, Response
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Histograms (Prometheus text exposition format)
+# ---------------------------
+# Upper bounds in seconds; wide enough to cover a 15 s gateway timeout and slow mining.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        pos = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            # counts are stored per bucket and made cumulative at render time
+            if pos < len(self.buckets):
+                series[pos] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, key))
+            sep = "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "nationpost_request_seconds",
+    "Time spent handling an HTTP request.",
+    ("method", "endpoint", "status")
+)
+STAGE_SECONDS = Histogram(
+    "nationpost_stage_seconds",
+    "Time spent in a backend stage (pinata_pin, rss_fetch, gemini_call, pow_mining, "
+    "chain_save, gateway_fetch, mongo_query).",
+    ("stage",)
+)
+
+REGISTRY = [REQUEST_SECONDS, STAGE_SECONDS]
+
+# The current request's span list, held in a context variable rather than on flask.g
+# so work the request hands to the shared event loop or a pool (see app.aio) still
+# reports to it
+_request_spans = ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def span(stage):
+    """Time a block of work as `stage`, feeding the stage histogram and the request's span list."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# Flask wiring
+# ---------------------------
+def init_app(app):
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        g.spans = []
+        _request_spans.set(g.spans)
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint, status=response.status_code)
+
+        # Per-request spans, summed per stage, also go out as a Server-Timing header
+        totals = {}
+        for stage, seconds in g.get("spans", []):
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        timing = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items()]
+        timing.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(timing)
+        logger.debug("%s %s -> %s in %.1f ms %s", request.method, endpoint, response.status_code,
+                     elapsed * 1000, {k: round(v * 1000, 1) for k, v in totals.items()})
+        return response
+
+    @app.teardown_request
+    def _end_spans(exc=None):
+        # set, not reset by token: a streamed response may be torn down in another context
+        _request_spans.set(None)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,26 @@
+"""
+Re-hash an existing chain under the current block hash version:
+
+    python -m app.migrate_chain [--file data/blockchain.json] [--version 2]
+
+Stop every worker first. Block hashes change (the old file is kept as a .bak), so
+re-point replicas and re-pin any metadata that embeds a block_hash afterwards.
+"""
+import argparse
+from app.block_hash import HASH_VERSION
+from app.blockchain_manager import BlockchainManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-hash the chain under a new block hash version.")
+    parser.add_argument("--file", default="data/blockchain.json")
+    parser.add_argument("--version", type=int, default=HASH_VERSION)
+    args = parser.parse_args()
+
+    manager = BlockchainManager(args.file)
+    count = manager.migrate_hashes(args.version)
+    print(f"re-hashed {count} blocks as version {args.version}; chain valid: {manager.is_chain_valid(deep=True)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,117 @@
 from flask import Blueprint, jsonify, request
-from app.blockchain_manager import BlockchainManager
+import time
+from app.blockchain_manager import get_manager
+from app.http_cache import tip_cached
 
 blockchain_bp = Blueprint("blockchain", __name__, url_prefix="/blockchain")
-manager = BlockchainManager()
 
 
 def _reload_chain():
-    """Reload chain from on-disk file so separate manager instances stay in sync."""
+    """Reload chain from on-disk file so other processes' blocks are seen; returns the manager."""
+    manager = get_manager()
     try:
-        manager.chain = manager._load_chain()
+        manager.reload()
     except Exception:
         # If loading fails, keep current in-memory chain
         pass
+    return manager
 
 @blockchain_bp.route("/mine", methods=["POST"])
 def mine():
-    data = request.json
-    block = manager.add_block(data)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        # block data is read as an object everywhere (indexes, cards, search)
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    block = get_manager().add_block(data)
     return jsonify({"message": "Block mined", "block": block}), 201
 
 @blockchain_bp.route("/chain", methods=["GET"])
+@tip_cached
 def chain():
     # ensure we reflect any blocks added by other instances (e.g. upload)
-    _reload_chain()
-    return jsonify(manager.chain), 200
+    manager = _reload_chain()
+    return jsonify(manager.chain.to_list()), 200
 
 @blockchain_bp.route("/validate", methods=["GET"])
 def validate():
-    # validate against the latest on-disk chain
-    _reload_chain()
-    valid = manager.is_chain_valid()
-    return jsonify({"valid": valid}), 200
+    # validate against the latest on-disk chain, re-digesting every block's data (never
+    # served from the tip cache: tampering with an older block leaves the tip unchanged);
+    # ?fast=1 only checks hashes and links (it can't see tampered data)
+    manager = _reload_chain()
+    deep = request.args.get("fast", "").lower() not in ("1", "true", "yes")
+    valid = manager.is_chain_valid(deep=deep)
+    return jsonify({"valid": valid, "deep": deep}), 200
 
-from flask import Blueprint, jsonify
-from app.blockchain_manager import BlockchainManager
+# ---------------------------
+# Incremental sync (read replicas, see app.chain_follower)
+# ---------------------------
+MAX_SYNC_BLOCKS = 5000
+MAX_WAIT_SECONDS = 30
+
+
+def _int_arg(name, default):
+    try:
+        return int(request.args.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _tip(manager):
+    tip = manager.chain[-1]
+    return {"index": tip["index"], "hash": tip["hash"]}
+
+
+@blockchain_bp.route("/since/<int:index>", methods=["GET"])
+def blocks_since(index):
+    """
+    Blocks with an index greater than `index`, oldest-first.
+
+    Query params:
+      - limit (int): maximum blocks to return (default 500, capped at 5000)
+      - wait (int): seconds to hold the request open while there is nothing new
+        (long-poll, default 0, capped at 30)
+    """
+    limit = max(1, min(_int_arg("limit", 500), MAX_SYNC_BLOCKS))
+    deadline = time.monotonic() + max(0, min(_int_arg("wait", 0), MAX_WAIT_SECONDS))
+    manager = _reload_chain()
+    while len(manager.chain) <= index and time.monotonic() < deadline:
+        time.sleep(0.25)
+        manager = _reload_chain()
+
+    # block indexes are 1-based and contiguous, so index N lives at position N - 1
+    blocks = manager.blocks_between(index, index + limit)
+    return jsonify({
+        "blocks": blocks,
+        "tip": _tip(manager),
+        "has_more": index + len(blocks) < len(manager.chain)
+    }), 200
+
+
+@blockchain_bp.route("/range", methods=["GET"])
+def blocks_range():
+    """
+    Blocks with `from` <= index <= `to` (inclusive, at most 5000 per call).
+    """
+    manager = _reload_chain()
+    start = max(1, _int_arg("from", 1))
+    stop = _int_arg("to", len(manager.chain))
+    if stop < start:
+        return jsonify({"error": "'to' must not be less than 'from'"}), 400
+    stop = min(stop, start + MAX_SYNC_BLOCKS - 1)
+    return jsonify({
+        "blocks": manager.blocks_between(start - 1, stop),
+        "tip": _tip(manager)
+    }), 200
 
 # Blueprint
 # Duplicate blueprint section continued below — keep behavior consistent by reloading
 
 # ✅ Get full blockchain (duplicate section kept for compatibility)
 @blockchain_bp.route("/chain", methods=["GET"])
+@tip_cached
 def get_chain():
-    _reload_chain()
-    return jsonify(manager.chain), 200
+    manager = _reload_chain()
+    return jsonify(manager.chain.to_list()), 200
 
 # ✅ Verify a block hash
 @blockchain_bp.route("/verify/<block_hash>", methods=["GET"])
@@ -51,19 +120,20 @@ def verify_block(block_hash):
     Check if a given block hash exists in the blockchain.
     """
     # reload to ensure latest blocks are checked
-    _reload_chain()
+    manager = _reload_chain()
     chain = manager.chain
 
-    # Search for a block with the given hash
-    for block in chain:
-        if block.get("hash") == block_hash:
-            return jsonify({
-                "verified": True,
-                "message": "Block found in blockchain.",
-                "block_index": block.get("index"),
-                "block_data": block.get("data"),
-                "timestamp": block.get("timestamp")
-            }), 200
+    # Search the packed hash column for the given hash
+    pos = chain.find(block_hash)
+    if pos >= 0:
+        block = chain[pos]
+        return jsonify({
+            "verified": True,
+            "message": "Block found in blockchain.",
+            "block_index": block.get("index"),
+            "block_data": block.get("data"),
+            "timestamp": block.get("timestamp")
+        }), 200
 
     # If no match found
     return jsonify({
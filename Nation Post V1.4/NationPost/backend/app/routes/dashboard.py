@@ -1,17 +1,28 @@
-from flask import Blueprint, jsonify, request
-import requests
-from app.blockchain_manager import BlockchainManager
+from flask import Blueprint, jsonify, request, Response
+import logging
+import queue
+import threading
+from app.blockchain_manager import block_data, get_manager
+from app.gateway_client import get_gateway_client
+from app.http_cache import no_store, tip_cached
+from app.media_cache import get_chain_media, is_cid
+from app.metadata_cache import get_metadata_cache
+from app.search_index import get_search_indexer
+from app.events import Broadcaster, ChainWatcher, sse_frame
+
+logger = logging.getLogger(__name__)
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
-manager = BlockchainManager()
 
 
 def _reload_chain():
-    """Reload chain from disk so dashboard notices new blocks written by other modules."""
+    """Reload chain from disk so dashboard notices new blocks written by other processes."""
+    manager = get_manager()
     try:
-        manager.chain = manager._load_chain()
+        manager.reload()
     except Exception:
         pass
+    return manager
 
 
 def _map_metadata_to_card(metadata, fallback_block=None):
@@ -63,27 +74,33 @@ def _map_metadata_to_card(metadata, fallback_block=None):
 
 def _map_block_to_card(block):
     """Create a minimal card from a blockchain block's data when metadata can't be fetched."""
-    data = block.get("data") or {}
+    data = block_data(block)
     title = data.get("title")
     ipfs_url = data.get("ipfs_url") or ""
     cid = data.get("metadata_hash")
     if not cid and isinstance(ipfs_url, str) and "/ipfs/" in ipfs_url:
         cid = ipfs_url.rsplit("/", 1)[-1]
 
-    desc = data.get("description") or title or ""
-    words = [w for w in str(desc).split() if w]
-    excerpt = " ".join(words[:20])
-    if len(words) > 20:
-        excerpt = excerpt + "..."
+    # blocks mined since the feed indexes were added carry the card fields themselves
+    excerpt = data.get("excerpt")
+    if excerpt is None:
+        desc = data.get("description") or title or ""
+        words = [w for w in str(desc).split() if w]
+        excerpt = " ".join(words[:20])
+        if len(words) > 20:
+            excerpt = excerpt + "..."
 
-    thumbnail = cid if cid else None
+    thumbnail = data.get("thumbnail") or (cid if cid else None)
+
+    uploader = data.get("uploaded_by") or {}
+    user_id = uploader.get("userID") if isinstance(uploader, dict) else None
 
     return {
-        "id": None,
+        "id": user_id,
         "title": title,
         "excerpt": excerpt,
         "thumbnail": thumbnail,
-        "reliability": None,
+        "reliability": data.get("reliability"),
         "category": data.get("category"),
         "publishedAt": data.get("timestamp"),
         "blockHash": block.get("hash"),
@@ -91,18 +108,111 @@ def _map_block_to_card(block):
     }
 
 
+def _paged_feed(positions):
+    """
+    Page through a list of chain positions (oldest-first) newest-first and map each
+    block to a card straight from the block data, without touching IPFS.
+
+    Query params:
+      - limit (int): page size (default 15)
+      - offset (int): number of newest articles to skip (default 0)
+    """
+    try:
+        limit = max(0, int(request.args.get("limit", 15)))
+    except Exception:
+        limit = 15
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+    except Exception:
+        offset = 0
+
+    chain = get_manager().chain or []
+    total = len(positions)
+    end = total - offset
+    start = max(0, end - limit)
+    items = [_map_block_to_card(chain[pos]) for pos in reversed(positions[start:max(0, end)])]
+
+    return jsonify({
+        "count": len(items),
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "items": items
+    }), 200
+
+
+@dashboard_bp.route("/by-user/<userID>", methods=["GET"])
+def articles_by_user(userID):
+    """Return a page of article cards uploaded by `userID`, newest-first."""
+    manager = _reload_chain()
+    return _paged_feed(manager.user_index.get(userID, []))
+
+
+@dashboard_bp.route("/by-category/<category>", methods=["GET"])
+def articles_by_category(category):
+    """Return a page of article cards in `category` (case-insensitive), newest-first."""
+    manager = _reload_chain()
+    key = manager.normalize_category(category)
+    return _paged_feed(manager.category_index.get(key, []))
+
+
+def _fetch_metadata(cid, ipfs_url=None):
+    """
+    Metadata JSON document for `cid` from the local metadata cache, or else through
+    the shared gateway client, which tries the healthiest gateways first (the block's
+    own URL last, if it isn't one of them). Returns None if every gateway fails.
+    """
+    return get_metadata_cache().fetch(cid, ipfs_url)
+
+
+@dashboard_bp.route("/gateways", methods=["GET"])
+def gateway_health():
+    """Observed latency, error rate, timeout and circuit state per IPFS gateway, best first."""
+    return jsonify(get_gateway_client().snapshot()), 200
+
+
+def _card_for_block(block, metadata=None):
+    """
+    Rich card from the block's IPFS metadata, or the block-data card if that can't
+    be fetched. `metadata` is fetched when None; pass False if a fetch already failed.
+    """
+    data = block_data(block)
+    cid = data.get("metadata_hash")
+    if metadata is None:
+        metadata = _fetch_metadata(cid, data.get("ipfs_url"))
+    if isinstance(metadata, dict):
+        # attach metadata hash if not present
+        metadata.setdefault("metadata_hash", cid)
+        card = _map_metadata_to_card(metadata, fallback_block=block)
+        # include CID explicitly for frontend
+        card["metadata_hash"] = cid
+        return card
+    # a later request may reach the metadata, so don't cache the page built from this
+    no_store()
+    return _map_block_to_card(block)
+
+
+def _cards_for_blocks(blocks):
+    """_card_for_block for each block, with the metadata cache misses fetched concurrently."""
+    cids = [block_data(block).get("metadata_hash") for block in blocks]
+    docs = get_metadata_cache().fetch_many(
+        (cid, block_data(block).get("ipfs_url")) for cid, block in zip(cids, blocks)
+    )
+    return [_card_for_block(block, docs.get(cid) or False) for cid, block in zip(cids, blocks)]
+
+
 @dashboard_bp.route("/latest", methods=["GET"])
 def latest_article():
     # keep existing behavior: return a single latest mapped card
     try:
         # reload chain from disk so we see newly added blocks
-        _reload_chain()
+        manager = _reload_chain()
         chain = manager.chain or []
         chosen_block = None
         metadata_hash = None
-        
+
         for block in reversed(chain):
-            data = block.get("data", {}) if isinstance(block, dict) else {}
+            data = block_data(block)
             if data.get("metadata_hash"):
                 chosen_block = block
                 metadata_hash = data.get("metadata_hash")
@@ -111,28 +221,7 @@ def latest_article():
         if not chosen_block or not metadata_hash:
             return jsonify({"error": "No articles found in blockchain"}), 404
 
-        ipfs_url = chosen_block.get("data", {}).get("ipfs_url") or f"https://gateway.pinata.cloud/ipfs/{metadata_hash}"
-        metadata = None
-        
-        # Try multiple gateways
-        gateways = [
-            ipfs_url,
-            f"https://gateway.pinata.cloud/ipfs/{metadata_hash}",
-            f"https://ipfs.io/ipfs/{metadata_hash}",
-            f"https://dweb.link/ipfs/{metadata_hash}"
-        ]
-        
-        for gateway_url in gateways:
-            try:
-                r = requests.get(gateway_url, timeout=15)
-                if r.status_code == 200:
-                    try:
-                        metadata = r.json()
-                        break
-                    except Exception:
-                        continue
-            except Exception:
-                continue
+        metadata = _fetch_metadata(metadata_hash, block_data(chosen_block).get("ipfs_url"))
 
         if not metadata:
             # Fallback to block data
@@ -141,13 +230,12 @@ def latest_article():
         card = _map_metadata_to_card(metadata, fallback_block=chosen_block)
         return jsonify(card), 200
     except Exception as e:
-        print(f"ERROR in /latest: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("ERROR in /latest: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 @dashboard_bp.route("/list", methods=["GET"])
+@tip_cached
 def list_articles():
     """
     Return up to `limit` latest article cards by scanning the blockchain (newest-first),
@@ -161,86 +249,26 @@ def list_articles():
             limit = int(request.args.get("limit", 15))
         except Exception:
             limit = 15
-        
-        # DEBUG: Print received limit
-        print(f"=== /list called with limit={limit} ===")
 
         # reload chain from disk so list reflects recent uploads
-        _reload_chain()
+        manager = _reload_chain()
         chain = manager.chain or []
-        items = []
-        
-        # DEBUG: Print chain length
-        print(f"Chain has {len(chain)} blocks")
 
         # iterate newest to oldest and collect up to limit
+        blocks = []
         for block in reversed(chain):
-            if len(items) >= limit:
+            if len(blocks) >= limit:
                 break
-            data = block.get("data", {}) if isinstance(block, dict) else {}
-            cid = data.get("metadata_hash")
-            if not cid:
-                print(f"Skipping block at index {block.get('index')}: no metadata_hash found")
-                continue
-            
-            ipfs_url = data.get("ipfs_url") or f"https://gateway.pinata.cloud/ipfs/{cid}"
-            metadata = None
-            
-            # Try multiple gateways with increased timeout
-            gateways = [
-                ipfs_url,
-                f"https://gateway.pinata.cloud/ipfs/{cid}",
-                f"https://ipfs.io/ipfs/{cid}",
-                f"https://dweb.link/ipfs/{cid}"
-            ]
-            
-            for gateway_url in gateways:
-                try:
-                    print(f"Attempting to fetch from: {gateway_url}")
-                    r = requests.get(gateway_url, timeout=15)
-                    if r.status_code == 200:
-                        try:
-                            metadata = r.json()
-                            print(f"✓ Successfully fetched metadata from {gateway_url}")
-                            break
-                        except Exception as json_err:
-                            print(f"✗ Failed to parse JSON from {gateway_url}: {json_err}")
-                            continue
-                    else:
-                        print(f"✗ Gateway {gateway_url} returned status {r.status_code}")
-                except requests.Timeout:
-                    print(f"✗ Timeout fetching from {gateway_url}")
-                    continue
-                except requests.RequestException as req_err:
-                    print(f"✗ Request error from {gateway_url}: {req_err}")
-                    continue
-                except Exception as err:
-                    print(f"✗ Unexpected error from {gateway_url}: {err}")
-                    continue
-            
-            # Use fallback card if metadata fetch failed
-            if isinstance(metadata, dict):
-                # attach metadata hash if not present
-                metadata.setdefault("metadata_hash", cid)
-                card = _map_metadata_to_card(metadata, fallback_block=block)
-                # include CID explicitly for frontend
-                card["metadata_hash"] = cid
-                items.append(card)
-                print(f"Added card from metadata: {card.get('title')}")
-            else:
-                # Fallback: create minimal card from block data
-                print(f"Metadata fetch failed for CID {cid}. Using fallback card from block data.")
-                card = _map_block_to_card(block)
-                items.append(card)
-                print(f"Added fallback card: {card.get('title')}")
+            data = block_data(block)
+            if data.get("metadata_hash"):
+                blocks.append(block)
+        items = _cards_for_blocks(blocks)
 
-        print(f"Returning {len(items)} items out of {len(chain)} blocks")
+        logger.debug("/list returning %d items (limit=%d) out of %d blocks", len(items), limit, len(chain))
         return jsonify({"count": len(items), "items": items}), 200
 
     except Exception as e:
-        print(f"ERROR in /list: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("ERROR in /list: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -248,50 +276,27 @@ def list_articles():
 def get_article_by_cid(cid):
     """
     Fetch the raw metadata JSON for a given metadata CID from IPFS and return it.
-    If fetching fails, return 502.
+    Only CIDs a block on the chain refers to are served (404 otherwise), so this
+    can't fill the metadata cache with arbitrary documents. If fetching fails, return 502.
     """
+    if not is_cid(cid):
+        return jsonify({"error": "Invalid CID"}), 400
     try:
-        # try known ipfs gateways
-        try_urls = [
-            f"https://gateway.pinata.cloud/ipfs/{cid}",
-            f"https://ipfs.io/ipfs/{cid}",
-            f"https://dweb.link/ipfs/{cid}"
-        ]
-        metadata = None
-        for url in try_urls:
-            try:
-                print(f"Fetching article metadata from: {url}")
-                r = requests.get(url, timeout=15)
-                if r.status_code == 200:
-                    try:
-                        metadata = r.json()
-                        print(f"✓ Successfully fetched from {url}")
-                        break
-                    except Exception as json_err:
-                        print(f"✗ JSON parse error from {url}: {json_err}")
-                        continue
-                else:
-                    print(f"✗ Status {r.status_code} from {url}")
-            except requests.Timeout:
-                print(f"✗ Timeout from {url}")
-                continue
-            except Exception as err:
-                print(f"✗ Error from {url}: {err}")
-                continue
+        if not get_chain_media().has_metadata(cid):
+            return jsonify({"error": "No article on the chain has this metadata CID"}), 404
+        metadata = _fetch_metadata(cid)
 
         if metadata is None:
-            print(f"Failed to fetch metadata for CID: {cid}")
             return jsonify({"error": "Unable to fetch metadata from IPFS for provided CID"}), 502
 
         return jsonify(metadata), 200
     except Exception as e:
-        print(f"ERROR in /article/{cid}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("ERROR in /article/%s: %s", cid, e)
         return jsonify({"error": str(e)}), 500
 
 
 @dashboard_bp.route("/all", methods=["GET"])
+@tip_cached
 def all_articles():
     """
     Return cards for all article blocks found in the blockchain (newest-first).
@@ -299,57 +304,166 @@ def all_articles():
     or a minimal fallback card from the block data.
     """
     try:
-        _reload_chain()
+        manager = _reload_chain()
         chain = manager.chain or []
-        items = []
-        
-        print(f"=== /all endpoint called: {len(chain)} total blocks ===")
-        
-        for block in reversed(chain):
-            data = block.get("data") or {}
-            cid = data.get("metadata_hash")
-            if not cid:
-                print(f"Skipping block at index {block.get('index')}: no metadata_hash")
-                continue
-            
-            ipfs_url = data.get("ipfs_url") or f"https://gateway.pinata.cloud/ipfs/{cid}"
-            metadata = None
-            
-            # Try multiple gateways with longer timeout
-            gateways = [
-                ipfs_url,
-                f"https://gateway.pinata.cloud/ipfs/{cid}",
-                f"https://ipfs.io/ipfs/{cid}",
-                f"https://dweb.link/ipfs/{cid}"
-            ]
-            
-            for gateway_url in gateways:
-                try:
-                    r = requests.get(gateway_url, timeout=15)
-                    if r.status_code == 200:
-                        try:
-                            metadata = r.json()
-                            break
-                        except Exception:
-                            continue
-                except Exception:
-                    continue
+        blocks = [block for block in reversed(chain) if block_data(block).get("metadata_hash")]
+        items = _cards_for_blocks(blocks)
 
-            if isinstance(metadata, dict):
-                metadata.setdefault("metadata_hash", cid)
-                card = _map_metadata_to_card(metadata, fallback_block=block)
-                card["metadata_hash"] = cid
-                items.append(card)
-                print(f"✓ Added rich card: {card.get('title')}")
-            else:
-                card = _map_block_to_card(block)
-                items.append(card)
-                print(f"✓ Added fallback card for CID {cid}")
-
-        print(f"Returning {len(items)} cards")
+        logger.debug("/all returning %d cards out of %d blocks", len(items), len(chain))
         return jsonify({"count": len(items), "items": items}), 200
     except Exception as e:
-        print(f"ERROR in /all: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("ERROR in /all: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@dashboard_bp.route("/search", methods=["GET"])
+def search_articles():
+    """
+    Full-text search over article title, description, category and source, best
+    match first; the last word also matches as a prefix ("elec" finds "election").
+    Cards come from the block data, so no IPFS fetches.
+
+    Query params:
+      - q (str): search terms
+      - limit (int): page size (default 15, at most 100)
+      - offset (int): number of results to skip (default 0)
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "Missing search query (q)"}), 400
+    try:
+        limit = min(100, max(0, int(request.args.get("limit", 15))))
+    except Exception:
+        limit = 15
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+    except Exception:
+        offset = 0
+
+    try:
+        # the reload hands blocks other processes mined to the indexer
+        chain = _reload_chain().chain or []
+        indexer = get_search_indexer()
+        total, hits = indexer.index.search(q, limit=limit, offset=offset)
+        items = []
+        for block_index, score in hits:
+            if 0 < block_index <= len(chain):
+                card = _map_block_to_card(chain[block_index - 1])
+                card["score"] = score
+                items.append(card)
+        return jsonify({
+            "query": q,
+            "count": len(items),
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "indexing": indexer.backfilling,
+            "items": items
+        }), 200
+    except Exception as e:
+        logger.exception("ERROR in /search: %s", e)
         return jsonify({"error": str(e)}), 500
+
+
+# ---------------------------
+# Live feed (server-sent events)
+# ---------------------------
+HEARTBEAT_SECONDS = 15
+REPLAY_LIMIT = 100
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+# ASGI scope key: set by app.asgi_routes, which streams the live events on the
+# event loop once this view has sent the headers and the replay (see stream())
+SSE_HANDOFF = "nationpost.sse_handoff"
+
+_broadcaster = Broadcaster()
+_watcher = None
+_feed_lock = threading.Lock()
+
+
+def _publish_cards(blocks):
+    """Manager listener: turn each new article block into one shared `card` event."""
+    for block in blocks:
+        if block_data(block).get("metadata_hash"):
+            index = block.get("index")
+            _broadcaster.publish(index, sse_frame("card", _map_block_to_card(block), index))
+
+
+def _ensure_feed():
+    global _watcher
+    with _feed_lock:
+        if _watcher is None:
+            manager = get_manager()
+            manager.add_listener(_publish_cards)
+            _watcher = ChainWatcher(manager, _broadcaster)
+    _watcher.ensure_running()
+
+
+@dashboard_bp.route("/stream", methods=["GET"])
+def stream():
+    """
+    Server-sent events: a `card` event (same shape as /dashboard/by-user items, id =
+    block index) for every article block committed from now on. Reconnecting clients
+    send Last-Event-ID (or ?lastEventId=) and get the article blocks they missed,
+    up to the newest 100.
+    """
+    handoff = (request.environ.get("asgi.scope") or {}).get(SSE_HANDOFF)
+    q = _broadcaster.subscribe() if handoff is None else None
+    streaming = False
+    try:
+        _ensure_feed()
+
+        replay = []
+        try:
+            last_id = int(request.headers.get("Last-Event-ID") or request.args.get("lastEventId") or 0)
+        except ValueError:
+            last_id = 0
+        if last_id:
+            manager = _reload_chain()
+            chain = manager.chain
+            for pos in range(len(chain) - 1, max(last_id, 0) - 1, -1):
+                block = chain[pos]
+                if block_data(block).get("metadata_hash"):
+                    replay.append((block["index"], sse_frame("card", _map_block_to_card(block), block["index"])))
+                    if len(replay) >= REPLAY_LIMIT:
+                        break
+            replay.reverse()
+
+        if handoff is not None:
+            # Async serving: the caller subscribed before calling this view and follows
+            # up with the live events itself, so this thread is only held for the replay
+            handoff["sent"] = replay[-1][0] if replay else last_id
+
+            def prologue():
+                yield b"retry: 3000\n\n"
+                for _, frame in replay:
+                    yield frame
+
+            return Response(prologue(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+        def generate():
+            sent = last_id
+            yield b"retry: 3000\n\n"
+            for event_id, frame in replay:
+                sent = event_id
+                yield frame
+            while True:
+                try:
+                    event_id, frame = q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield b": keep-alive\n\n"
+                    continue
+                if event_id is not None and event_id <= sent:
+                    continue
+                sent = event_id if event_id is not None else sent
+                yield frame
+
+        response = Response(generate(), mimetype="text/event-stream", headers=SSE_HEADERS)
+        # on close, even if the client left before the generator started
+        response.call_on_close(lambda: _broadcaster.unsubscribe(q))
+        streaming = True
+        return response
+    finally:
+        # the subscription must not outlive a request that failed before streaming:
+        # it would keep the ChainWatcher reloading forever
+        if q is not None and not streaming:
+            _broadcaster.unsubscribe(q)
@@ -3,23 +3,14 @@ import bcrypt
 import jwt
 from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
+from app import aio
+from app.db import get_users_collection
+from app.metrics import span
 from dotenv import load_dotenv
 
 # Create Blueprint — add a URL prefix (recommended)
 login_bp = Blueprint("login", __name__, url_prefix="/login")
 
-
-
-# Load environment variables
-load_dotenv()
-mongo_uri = os.getenv("MONGODB_URI")
-
-# MongoDB setup
-client = MongoClient(mongo_uri)
-db = client.authDB
-users_collection = db.users
-
 # Login route
 @login_bp.route("", methods=["POST", "OPTIONS"])
 def login():
@@ -29,7 +20,8 @@ def login():
     email = data.get("email")
     password = data.get("password").encode("utf-8")
 
-    user = users_collection.find_one({"email": email})
+    with span("mongo_query"):
+        user = get_users_collection().find_one({"email": email})
     if not user:
         return jsonify({"message": "Invalid credentials"}), 401
 
@@ -37,7 +29,7 @@ def login():
     if isinstance(stored_hash, str):
         stored_hash = stored_hash.encode("utf-8")
 
-    if bcrypt.checkpw(password, stored_hash):
+    if aio.offload(bcrypt.checkpw, password, stored_hash):
         # Issue JWT containing userID and name
         load_dotenv()
         JWT_SECRET = os.getenv("JWT_SECRET")
@@ -0,0 +1,60 @@
+from flask import Blueprint, jsonify, request, send_file
+import logging
+import os
+from app.media_cache import get_chain_media, get_media_cache, is_cid
+
+logger = logging.getLogger(__name__)
+
+media_bp = Blueprint("media", __name__, url_prefix="/media")
+
+# CIDs are immutable, so browsers and proxies may keep a response for good
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Only media is served from the API origin; anything else (HTML, scripts, JSON)
+# would run or be read with the API's origin
+SERVED_TYPES = ("image/", "video/")
+
+
+@media_bp.route("/<cid>", methods=["GET"])
+def media(cid):
+    """
+    Serve an IPFS object (thumbnail, image or video) from the local media cache,
+    racing the public gateways on a miss. Range requests are answered with 206, so
+    videos can seek. Only CIDs articles on the chain refer to are served (404
+    otherwise), and only as image/* or video/* (415 otherwise).
+
+    Query params:
+      - w (int): serve a JPEG thumbnail at most this wide (160, 320 or 640) instead
+        of the original, when the object is an image and Pillow is installed
+    """
+    if not is_cid(cid):
+        return jsonify({"error": "Invalid CID"}), 400
+    if cid not in get_chain_media():
+        return jsonify({"error": "No article on the chain refers to this CID"}), 404
+
+    cache = get_media_cache()
+    try:
+        entry = cache.get(cid)
+    except Exception as e:
+        logger.exception("ERROR in /media/%s: %s", cid, e)
+        return jsonify({"error": str(e)}), 500
+    if entry is None:
+        return jsonify({"error": "Unable to fetch media from IPFS for provided CID"}), 502
+
+    path, mimetype = entry
+    if not mimetype.lower().startswith(SERVED_TYPES):
+        return jsonify({"error": f"Not an image or video ({mimetype})"}), 415
+    etag = cid
+    width = request.args.get("w", type=int)
+    if width:
+        variant = cache.variant(cid, width)
+        if variant is not None:
+            path, mimetype, etag = variant, "image/jpeg", os.path.basename(variant)
+
+    # send_file handles If-None-Match and Range, and hands the open file to the
+    # server's wsgi.file_wrapper (sendfile under gunicorn)
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=31536000)
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    # an SVG opened directly still can't run script or act as the API origin
+    response.headers["Content-Security-Policy"] = "sandbox"
+    return response
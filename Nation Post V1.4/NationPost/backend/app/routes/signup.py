@@ -1,22 +1,13 @@
 from flask import Blueprint, jsonify, request
-import os
-from dotenv import load_dotenv
-from pymongo import MongoClient
+from app import aio
+from app.db import get_users_collection
+from app.metrics import span
 import bcrypt
 import uuid
 
 # Create Blueprint
 signup_bp = Blueprint("signup", __name__, url_prefix="/signup")
 
-# Load environment variables
-load_dotenv()
-mongo_uri = os.getenv("MONGODB_URI")
-
-# MongoDB setup
-client = MongoClient(mongo_uri)
-db = client.authDB
-users_collection = db.users
-
 # Signup route
 @signup_bp.route("/", methods=["POST"])
 def signup():
@@ -25,23 +16,28 @@ def signup():
     name = data.get("name")
     password = data.get("password").encode("utf-8")
 
+    users_collection = get_users_collection()
+
     # Check if user exists
-    if users_collection.find_one({"email": email}):
+    with span("mongo_query"):
+        existing = users_collection.find_one({"email": email})
+    if existing:
         return jsonify({"message": "User already exists"}), 409
 
     # Hash password
-    hashed_pw = bcrypt.hashpw(password, bcrypt.gensalt())
+    hashed_pw = aio.offload(bcrypt.hashpw, password, bcrypt.gensalt())
 
     # Create new user
-    users_collection.insert_one({
-        "name": name,
-        "userID": str(uuid.uuid4()),
-        "email": email,
-        "password": hashed_pw,
-        "articles": 0,
-        "verifications": 0,
-        "saved": [],
-        "trust_score": 0.0
-    })
+    with span("mongo_query"):
+        users_collection.insert_one({
+            "name": name,
+            "userID": str(uuid.uuid4()),
+            "email": email,
+            "password": hashed_pw,
+            "articles": 0,
+            "verifications": 0,
+            "saved": [],
+            "trust_score": 0.0
+        })
 
     return jsonify({"message": "Signup successful"}), 201
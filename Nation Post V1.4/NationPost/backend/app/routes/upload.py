@@ -6,8 +6,18 @@ import hashlib
 import datetime
 from dotenv import load_dotenv
 import jwt
-from app.blockchain_manager import BlockchainManager
-from pymongo import MongoClient
+import logging
+from app import aio
+from app.blockchain_manager import get_manager
+from app.db import get_users_collection
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.dedup_index import article_fingerprint, get_dedup_index, simhash
+from app.metadata_cache import get_metadata_cache
+from app.search_index import index_upload
+from app.metrics import span
+from app.upload_stream import MultipartBody, stream_sha256
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------
 # Load environment variables FIRST
@@ -17,14 +27,6 @@ PINATA_API_KEY = os.getenv("PINATA_API_KEY")
 PINATA_SECRET_API = os.getenv("PINATA_SECRET_API")
 JWT_SECRET = os.getenv("JWT_SECRET")
 
-# ---------------------------
-# MongoDB Setup BEFORE Blueprint
-# ---------------------------
-mongo_uri = os.getenv("MONGODB_URI")
-client = MongoClient(mongo_uri)
-db = client.authDB
-users_collection = db.users
-
 # ---------------------------
 # Create Blueprint
 # ---------------------------
@@ -38,22 +40,24 @@ headers = {
     "pinata_secret_api_key": PINATA_SECRET_API
 }
 
-# ---------------------------
-# Blockchain instance
-# ---------------------------
-manager = BlockchainManager()
+
+def _pin_file(item):
+    """Pin one uploaded file; `item` is (file_hashes entry, FileStorage, content type)."""
+    entry, file, content_type = item
+    # streamed from the spool, so a large video is never held in memory
+    body = MultipartBody({"pinataMetadata": json.dumps({"name": entry["pin_name"]})},
+                         "file", file.filename, file.stream, content_type)
+    return requests.post(PINATA_FILE_URL, data=body, headers=dict(headers, **{"Content-Type": body.content_type}))
+
 
 # ---------------------------
 # Upload route
 # ---------------------------
 @upload_bp.route("/", methods=["POST"])
 def upload_news():
+    uploading = None
     try:
-        # DEBUG: Print all received form fields
-        print("=== RECEIVED FORM DATA ===")
-        for key in request.form.keys():
-            print(f"{key}: {request.form.get(key)}")
-        print("=== END FORM DATA ===")
+        logger.debug("Received form fields: %s", list(request.form.keys()))
         
         # Extract form fields
         title = request.form.get("title")
@@ -63,22 +67,32 @@ def upload_news():
         # Accept both 'description' AND 'content' field names
         description = request.form.get("description") or request.form.get("content")
         
-        # DEBUG: Print what we extracted
-        print(f"Title: {title}")
-        print(f"Category: {category}")
-        print(f"Source: {source}")
-        print(f"Description: {description}")
-        print(f"Description length: {len(description or '')}")
-
-        # Step 1: Upload files (if provided)
+        logger.debug("Upload title=%r category=%r source=%r description_len=%d",
+                     title, category, source, len(description or ""))
+
+        # Step 0: Fingerprint the submission; an exact resubmission gets the original back.
+        # Files were hashed while being spooled (see app.upload_stream)
+        uploaded_files = request.files.getlist("files") if "files" in request.files else []
+        content_hashes = [stream_sha256(file.stream) for file in uploaded_files]
+        dedup = get_dedup_index()
+        fingerprint = article_fingerprint(title, description, category, source, content_hashes)
+        dedup.uploading(fingerprint)
+        uploading = fingerprint
+        existing = dedup.exact(fingerprint)
+        if existing is not None:
+            logger.info("Duplicate upload of block %s", existing.get("block_index"))
+            return jsonify(dict(existing, message="Article already on the blockchain", duplicate=True)), 200
+
+        # Step 1: Upload files (if provided); content pinned before is not sent again,
+        # and the rest are pinned concurrently
         file_hashes = []
-        if "files" in request.files:
-            uploaded_files = request.files.getlist("files")
+        if uploaded_files:
             image_idx = 0
             video_idx = 0
             other_idx = 0
             base_title = (title or "Untitled").strip()
-            for file in uploaded_files:
+            to_pin = []
+            for file, content_hash in zip(uploaded_files, content_hashes):
                 content_type = getattr(file, 'content_type', '') or ''
                 if content_type.startswith('image/'):
                     image_idx += 1
@@ -90,114 +104,131 @@ def upload_news():
                     other_idx += 1
                     pin_label = f"{base_title} - file {other_idx}"
 
-                files = {"file": (file.filename, file.stream, content_type)}
-                data = {"pinataMetadata": json.dumps({"name": pin_label})}
-                res = requests.post(PINATA_FILE_URL, files=files, data=data, headers=headers)
-
-                if res.status_code in (200, 201):
-                    ipfs_hash = res.json().get("IpfsHash")
-                    file_hashes.append({
-                        "filename": file.filename,
-                        "ipfsHash": ipfs_hash,
-                        "pin_name": pin_label
-                    })
-                else:
+                file_hashes.append({
+                    "filename": file.filename,
+                    "ipfsHash": dedup.known_file(content_hash),
+                    "pin_name": pin_label
+                })
+                if not file_hashes[-1]["ipfsHash"]:
+                    to_pin.append((file_hashes[-1], file, content_type))
+
+            with span("pinata_pin"):
+                responses = aio.map_blocking(_pin_file, to_pin)
+            for (entry, _, _), res in zip(to_pin, responses):
+                if res.status_code not in (200, 201):
                     return jsonify({
                         "error": "File upload failed",
                         "details": res.text
                     }), 500
+                entry["ipfsHash"] = res.json().get("IpfsHash")
 
-        # Step 2: Run verification
-        verification = {
-            "prediction": "UNKNOWN",
-            "confidence": 0,
-            "score": 5.0,
-            "reason": "verification not performed",
-            "sources": []
-        }
-        try:
-            from app.routes.verify_news import fact_check_news
-            verify_result, verify_sources = fact_check_news(title or "", description or "")
-
-            try:
-                raw_conf = float(verify_result.get("confidence", 0))
-            except (TypeError, ValueError):
-                raw_conf = 0.0
-            confidence = max(0, min(100, int(round(raw_conf))))
-
-            p = str(verify_result.get("prediction", "")).lower()
-            if "real" in p:
-                score_100 = confidence
-            elif "fake" in p:
-                score_100 = max(0, 100 - confidence)
-            elif "no evidence" in p or "unknown" in p:
-                score_100 = 0
-            else:
-                score_100 = confidence
-
-            try:
-                score_0_10 = round(float(score_100) / 10.0, 1)
-            except Exception:
-                score_0_10 = 5.0
-
-            verification = {
-                "prediction": verify_result.get("prediction"),
-                "confidence": confidence,
-                "score": score_0_10,
-                "reason": verify_result.get("reason"),
-                "sources": verify_sources
-            }
-
-        except Exception as e:
-            verification["reason"] = str(e)
-
-        # Determine uploader from JWT Authorization header
+        # Determine uploader from JWT Authorization header. Only a JWT-authenticated
+        # uploader's claims may share a Gemini prompt (see LLMGateway.check)
         uploaded_by = None
+        submitter = None
         try:
             auth = request.headers.get("Authorization", "")
-            print(f"=== JWT AUTH DEBUG ===")
-            print(f"Authorization header: {auth[:50] if auth else 'None'}...")
-            
+            logger.debug("Authorization header present: %s", bool(auth))
+
             if auth and auth.startswith("Bearer "):
                 token = auth.split(None, 1)[1]
                 try:
                     payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-                    print(f"Decoded JWT payload: {payload}")
-                    
+
                     user_id = payload.get("userID")
                     user_name = payload.get("name")
                     
                     if user_id and user_name:
                         uploaded_by = {"userID": user_id, "name": user_name}
-                        print(f"✓ Successfully extracted user from JWT: {uploaded_by}")
+                        submitter = user_id
+                        logger.debug("Uploader from JWT: %s", uploaded_by)
                     else:
-                        print(f"⚠ JWT missing userID or name")
+                        logger.debug("JWT missing userID or name")
                         
                 except jwt.ExpiredSignatureError:
-                    print("⚠ JWT token expired")
+                    logger.debug("JWT token expired")
                 except jwt.InvalidTokenError as e:
-                    print(f"⚠ Invalid JWT token: {e}")
+                    logger.debug("Invalid JWT token: %s", e)
                 except Exception as e:
-                    print(f"⚠ JWT decode error: {e}")
+                    logger.warning("JWT decode error: %s", e)
 
             # Fallback to form field if JWT didn't work
             if not uploaded_by:
                 user_id = request.form.get("userID") or request.form.get("user_id")
-                print(f"Fallback to form userID: {user_id}")
-                
+                logger.debug("Falling back to form userID: %s", user_id)
+
                 if user_id:
-                    user = users_collection.find_one({"userID": user_id}, {"_id": 0, "name": 1, "userID": 1})
+                    with span("mongo_query"):
+                        user = get_users_collection().find_one({"userID": user_id}, {"_id": 0, "name": 1, "userID": 1})
                     if user:
                         uploaded_by = {"userID": user.get("userID"), "name": user.get("name")}
-                        print(f"✓ Found user in DB: {uploaded_by}")
+                        logger.debug("Uploader from DB: %s", uploaded_by)
                     else:
-                        print(f"⚠ User not found in DB for userID: {user_id}")
+                        logger.debug("User not found in DB for userID: %s", user_id)
                         
         except Exception as e:
-            print(f"ERROR extracting uploader: {e}")
+            logger.warning("Error extracting uploader: %s", e)
             uploaded_by = None
 
-        print(f"=== FINAL uploaded_by: {uploaded_by} ===")
+        logger.debug("Final uploaded_by: %s", uploaded_by)
+
+        # Step 2: Run verification, reusing the result of a near-duplicate if there is one
+        text_fp = simhash(f"{title or ''} {description or ''}")
+        near = dedup.near(text_fp)
+        near_duplicate_of = None
+        verification = {
+            "prediction": "UNKNOWN",
+            "confidence": 0,
+            "score": 5.0,
+            "reason": "verification not performed",
+            "sources": []
+        }
+        if near is not None:
+            original, distance = near
+            near_duplicate_of = {
+                "block_index": original.get("block_index"),
+                "block_hash": original.get("block_hash"),
+                "metadataHash": original.get("metadataHash"),
+                "distance": distance
+            }
+            verification = dict(original.get("verification") or verification)
+            logger.info("Upload is a near-duplicate of block %s (distance %d)", original.get("block_index"), distance)
+        else:
+            try:
+                from app.routes.verify_news import fact_check_news
+                verify_result, verify_sources = fact_check_news(title or "", description or "", submitter=submitter)
+
+                try:
+                    raw_conf = float(verify_result.get("confidence", 0))
+                except (TypeError, ValueError):
+                    raw_conf = 0.0
+                confidence = max(0, min(100, int(round(raw_conf))))
+
+                p = str(verify_result.get("prediction", "")).lower()
+                if "real" in p:
+                    score_100 = confidence
+                elif "fake" in p:
+                    score_100 = max(0, 100 - confidence)
+                elif "no evidence" in p or "unknown" in p:
+                    score_100 = 0
+                else:
+                    score_100 = confidence
+
+                try:
+                    score_0_10 = round(float(score_100) / 10.0, 1)
+                except Exception:
+                    score_0_10 = 5.0
+
+                verification = {
+                    "prediction": verify_result.get("prediction"),
+                    "confidence": confidence,
+                    "score": score_0_10,
+                    "reason": verify_result.get("reason"),
+                    "sources": verify_sources
+                }
+
+            except Exception as e:
+                verification["reason"] = str(e)
 
         # Add publish timestamp
         published_at = datetime.datetime.utcnow().isoformat()
@@ -212,6 +243,8 @@ def upload_news():
             "uploaded_by": uploaded_by,
             "published_at": published_at
         }
+        if near_duplicate_of:
+            metadata["near_duplicate_of"] = near_duplicate_of
 
         # Step 3: Upload metadata JSON to Pinata
         pin_name = (title or "Untitled").strip()
@@ -220,7 +253,8 @@ def upload_news():
             "pinataContent": metadata
         }
 
-        res = requests.post(PINATA_JSON_URL, json=pin_payload, headers=headers)
+        with span("pinata_pin"):
+            res = requests.post(PINATA_JSON_URL, json=pin_payload, headers=headers)
 
         if res.status_code not in (200, 201):
             return jsonify({
@@ -230,8 +264,18 @@ def upload_news():
 
         metadata_hash = res.json().get("IpfsHash")
         ipfs_url = f"https://gateway.pinata.cloud/ipfs/{metadata_hash}"
+        # we already hold the document, so dashboards needn't wait for a gateway to see it
+        get_metadata_cache().put(metadata_hash, dict(metadata))
 
         # Step 4: Add to Blockchain
+        # Card fields are captured here so the per-user / per-category feeds never need IPFS
+        words = [w for w in (description or "").split() if w]
+        excerpt = " ".join(words[:20]) + ("..." if len(words) > 20 else "")
+        expected_pin = f"{(title or '').strip()} - image 1"
+        thumbnail = next((f["ipfsHash"] for f in file_hashes if f.get("pin_name") == expected_pin), None)
+        if not thumbnail and file_hashes:
+            thumbnail = file_hashes[0].get("ipfsHash")
+
         block_data = {
             "title": title,
             "category": category,
@@ -239,10 +283,20 @@ def upload_news():
             "metadata_hash": metadata_hash,
             "ipfs_url": ipfs_url,
             "content_hash": hashlib.sha256(metadata_hash.encode()).hexdigest(),
-            "timestamp": str(datetime.datetime.utcnow())
+            "timestamp": str(datetime.datetime.utcnow()),
+            "uploaded_by": uploaded_by,
+            "excerpt": excerpt,
+            "thumbnail": thumbnail,
+            "reliability": verification.get("score")
         }
 
-        block = manager.add_block(block_data)
+        block = get_manager().add_block(block_data)
+        # the article is mined from here on: later side effects log and carry on
+        try:
+            index_upload(block["index"], block_data, metadata)
+        except Exception as e:
+            # the search indexer picks the block up from the chain instead
+            logger.warning("Could not index upload %s for search: %s", block["index"], e)
 
         # Embed blockchain reference and repin
         try:
@@ -257,7 +311,8 @@ def upload_news():
                     "pinataMetadata": {"name": pin_name},
                     "pinataContent": metadata
                 }
-                rep = requests.post(PINATA_JSON_URL, json=repin_payload, headers=headers)
+                with span("pinata_pin"):
+                    rep = requests.post(PINATA_JSON_URL, json=repin_payload, headers=headers)
                 if rep.status_code in (200, 201):
                     new_metadata_hash = rep.json().get("IpfsHash")
                     ipfs_url = f"https://gateway.pinata.cloud/ipfs/{new_metadata_hash}"
@@ -272,9 +327,8 @@ def upload_news():
         except Exception:
             pass
 
-        # Step 5: Respond
-        return jsonify({
-            "message": "Article uploaded and added to blockchain successfully",
+        # Step 5: Remember the fingerprints and respond
+        result = {
             "metadataHash": metadata_hash,
             "ipfs_url": ipfs_url,
             "block_index": block["index"],
@@ -282,10 +336,18 @@ def upload_news():
             "files": file_hashes,
             "verification": verification,
             "uploaded_by": uploaded_by  # Include in response for debugging
-        }), 201
-
+        }
+        dedup.record(fingerprint, text_fp, result,
+                     {h: f["ipfsHash"] for h, f in zip(content_hashes, file_hashes)})
+        if near_duplicate_of:
+            result["near_duplicate_of"] = near_duplicate_of
+        return jsonify(dict(result, message="Article uploaded and added to blockchain successfully")), 201
+
+    except RequestEntityTooLarge as e:
+        return jsonify({"error": "Upload too large", "details": e.description}), 413
     except Exception as e:
-        print(f"ERROR in upload_news: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        logger.exception("ERROR in upload_news: %s", e)
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if uploading is not None:
+            dedup.done(uploading)
\ No newline at end of file
@@ -1,30 +1,18 @@
-import os
-import re
-import json
 import requests
-import feedparser
-from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
 from datetime import datetime, timedelta
-import google.generativeai as genai
-from dotenv import load_dotenv
 from flask import Blueprint, request, jsonify
+from app import aio
+from app.llm_gateway import get_llm_gateway
+from app.metrics import span
 
 # -------------------------------
 # Create Blueprint
 # -------------------------------
 verify_news_bp = Blueprint("verify_news", __name__)
 
-# -------------------------------
-# Load API Key
-# -------------------------------
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not GEMINI_API_KEY:
-    raise ValueError("Please set GEMINI_API_KEY in your .env file")
-
-genai.configure(api_key=GEMINI_API_KEY)
+# Gemini calls go through the shared LLM gateway (rate limit, concurrency cap,
+# deadlines, batching); feedparser and BeautifulSoup are imported on first use.
 
 # -------------------------------
 # Config
@@ -35,17 +23,6 @@ MAX_SOURCES = 5
 # -------------------------------
 # Helpers
 # -------------------------------
-def parse_gemini_response_as_dict(response_text):
-    """Extract JSON from Gemini response text and return as dict."""
-    try:
-        match = re.search(r"\{.*\}", response_text, re.DOTALL)
-        if match:
-            return json.loads(match.group())
-        else:
-            return {"prediction": "UNKNOWN", "confidence": 0, "reason": response_text}
-    except json.JSONDecodeError:
-        return {"prediction": "UNKNOWN", "confidence": 0, "reason": response_text}
-
 def extract_headline_from_url(url):
     """Extract headline/title from a webpage URL."""
     try:
@@ -54,6 +31,7 @@ def extract_headline_from_url(url):
     except requests.exceptions.RequestException:
         return None
 
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(response.text, "html.parser")
 
     if soup.find("meta", property="og:title"):
@@ -72,7 +50,14 @@ def get_recent_news(query, days=MAX_DAYS_LOOKBACK):
     base_url = "https://news.google.com/rss/search?q="
     url = f"{base_url}{quote_plus(query)}&hl=en-IN&gl=IN&ceid=IN:en"
 
-    feed = feedparser.parse(url)
+    import feedparser
+    with span("rss_fetch"):
+        # fetched over the shared client (see app.aio); feedparser only parses
+        try:
+            response = aio.run(aio.get_http().get(url, timeout=10))
+            feed = feedparser.parse(response.content)
+        except requests.RequestException:
+            return []
     cutoff = datetime.now() - timedelta(days=days)
 
     recent_news = []
@@ -88,8 +73,11 @@ def get_recent_news(query, days=MAX_DAYS_LOOKBACK):
 
     return recent_news[:MAX_SOURCES]
 
-def fact_check_news(headline, description=""):
-    """Fact-check a news claim using headline + description + Gemini."""
+def fact_check_news(headline, description="", submitter=None):
+    """
+    Fact-check a news claim using headline + description + Gemini. `submitter` is
+    the authenticated user making the claim, if any (see LLMGateway.check).
+    """
     full_claim = f"{headline}. {description}" if description else headline
 
     # Step 1: Get recent related news
@@ -112,28 +100,11 @@ def fact_check_news(headline, description=""):
                 "reason": f"Exact match found in news: '{title}'"
             }, evidence_news
 
-    # Step 3: Ask Gemini
-    evidence_text = "\n".join(f"- {title}" for title in evidence_titles)
-    model_input = f"""
-    Headline: {headline}
-    Description: {description}
-
-    Evidence from reputable sources:
-    {evidence_text}
-
-    Based on this evidence, decide if the news is REAL or FAKE.
-    Respond in JSON format:
-    {{
-        "prediction": "REAL or FAKE",
-        "confidence": "0-100",
-        "reason": "Short explanation"
-    }}
-    """
-
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(model_input)
+    # Step 3: Ask Gemini (UNKNOWN if no verdict arrives before the deadline)
+    with span("gemini_call"):
+        verdict = get_llm_gateway().check(headline, description, evidence_titles, submitter=submitter)
 
-    return parse_gemini_response_as_dict(response.text), evidence_news
+    return verdict, evidence_news
 
 # -------------------------------
 # Blueprint Route
@@ -0,0 +1,336 @@
+import bisect
+import gzip
+import json
+import logging
+import math
+import os
+import queue
+import re
+import threading
+from app.blockchain_manager import block_data
+from app.file_lock import FileLock
+from app.metadata_cache import get_metadata_cache
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Article search index
+# ---------------------------
+# An inverted index over each article's title, description, category and source,
+# kept in memory and persisted as gzipped JSON (data/search_index.json.gz) so a
+# restart only indexes blocks mined since the last save:
+#
+#   docs       [[block index, weighted length], ...]      doc id = position here
+#   postings   {term: [[doc id, weighted tf], ...]}        doc ids ascending
+#   last_index every block up to this index has been looked at; the backfill
+#              resumes after it (uploads indexed out of order don't move it)
+#
+# Every worker keeps its own copy in memory; a save merges in whatever other
+# workers saved since (under a file lock) before writing, so none of them loses
+# the others' documents.
+# Fields are weighted by repeating their terms (BM25F-style) and results are
+# ranked with BM25. The last query word also matches as a prefix, so partial
+# words typed into a search box find something.
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "data/search_index.json.gz")
+# SEARCH_INDEXING=0: no indexing in the background (at startup or upload); the
+# index catches up from the chain when the first search starts the indexer
+SEARCH_INDEXING = os.getenv("SEARCH_INDEXING", "1") != "0"
+FIELD_WEIGHTS = {"title": 3, "category": 2, "source": 1, "description": 1}
+K1 = 1.2
+B = 0.75
+PREFIX_EXPANSIONS = 50   # most vocabulary terms one prefix may expand to
+PREFIX_WEIGHT = 0.5      # a prefix match counts half as much as the whole word
+SAVE_EVERY = 100         # new documents between saves while indexing
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("a an and are as at be by for from has in is it of on or that the to was were will with".split())
+
+
+def tokenize(text):
+    return [w for w in _WORD_RE.findall(str(text or "").lower()) if w not in STOPWORDS]
+
+
+class SearchIndex:
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        # absolute, so saves from the indexer thread don't follow later chdirs
+        self.path = os.path.abspath(path)
+        self.docs = []
+        self.postings = {}
+        self.last_index = 0
+        self._vocabulary = None   # sorted terms, rebuilt after changes for prefix lookups
+        self._total_length = 0
+        self._indexed = set()     # block indexes already in the index
+        self._ahead = set()       # block indexes past last_index already looked at
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(f"{self.path}.lock")
+        self._mtime = None        # of the file as last loaded or saved here
+        self._unsaved = 0
+        self._load()
+
+    # -- persistence --
+    def _read(self):
+        """The saved index, or None if there is none (or it's unreadable)."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with gzip.open(self.path, "rt") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable search index %s: %s", self.path, e)
+            return None
+
+    def _load(self):
+        doc = self._read()
+        if doc is None:
+            return
+        self.docs = doc.get("docs", [])
+        self.postings = doc.get("postings", {})
+        self.last_index = doc.get("last_index", 0)
+        self._total_length = sum(length for _, length in self.docs)
+        self._indexed = {block_index for block_index, _ in self.docs}
+        self._ahead = {block_index for block_index in self._indexed if block_index > self.last_index}
+        self._mtime = os.path.getmtime(self.path)
+
+    def _merge_saved(self):
+        """Take in documents another worker saved that this copy doesn't have yet."""
+        try:
+            if os.path.getmtime(self.path) == self._mtime:
+                return
+        except OSError:
+            return
+        doc = self._read()
+        if doc is None:
+            return
+        missing = {doc_id: block_index for doc_id, (block_index, _) in enumerate(doc.get("docs", []))
+                   if block_index not in self._indexed}
+        counts = {doc_id: {} for doc_id in missing}
+        if missing:
+            for term, postings in doc.get("postings", {}).items():
+                for doc_id, tf in postings:
+                    if doc_id in counts:
+                        counts[doc_id][term] = tf
+        for doc_id, block_index in missing.items():
+            self._add_counts(block_index, counts[doc_id])
+        self._advance(doc.get("last_index", 0), contiguous=True)
+
+    def save(self):
+        """Write the index, merged with what other workers saved since, atomically."""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._file_lock:
+                with self._lock:
+                    self._merge_saved()
+                    payload = json.dumps({"docs": self.docs, "postings": self.postings,
+                                          "last_index": self.last_index}, separators=(",", ":"))
+                    self._unsaved = 0
+                with gzip.open(tmp_path, "wt", compresslevel=6) as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            logger.warning("Could not write search index %s: %s", self.path, e)
+
+    def needs_save(self, threshold=1):
+        """True once at least `threshold` changes haven't been saved."""
+        return self._unsaved >= threshold
+
+    # -- indexing --
+    def add(self, block_index, fields):
+        """Index one article; `fields` maps field name -> text. Returns False if already indexed."""
+        counts = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(fields.get(field)):
+                counts[term] = counts.get(term, 0) + weight
+        with self._lock:
+            self._advance(block_index)
+            if block_index in self._indexed:
+                return False
+            self._add_counts(block_index, counts)
+        return True
+
+    def _add_counts(self, block_index, counts):
+        doc_id = len(self.docs)
+        length = sum(counts.values())
+        self.docs.append([block_index, length])
+        self._indexed.add(block_index)
+        self._total_length += length
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).append([doc_id, tf])
+        self._vocabulary = None
+        self._unsaved += 1
+
+    def _advance(self, block_index, contiguous=False):
+        """
+        Record that `block_index` has been looked at (with contiguous=True: every
+        block up to it). last_index only moves over an unbroken run, so a block
+        indexed ahead of the backfill doesn't make a restart skip the ones before it.
+        """
+        if contiguous:
+            if block_index <= self.last_index:
+                return
+            self.last_index = block_index
+            self._ahead = {i for i in self._ahead if i > block_index}
+        elif block_index > self.last_index:
+            self._ahead.add(block_index)
+        while self.last_index + 1 in self._ahead:
+            self.last_index += 1
+            self._ahead.discard(self.last_index)
+
+    def __contains__(self, block_index):
+        return block_index in self._indexed
+
+    def clear(self):
+        with self._lock:
+            self.docs, self.postings, self.last_index = [], {}, 0
+            self._vocabulary, self._total_length, self._indexed, self._ahead = None, 0, set(), set()
+            self._unsaved += 1
+            # a rebuild replaces what is saved rather than merging with it
+            self._mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+
+    def mark_seen(self, block_index):
+        with self._lock:
+            self._advance(block_index)
+
+    # -- queries --
+    def _expand(self, term):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        start = bisect.bisect_left(self._vocabulary, term)
+        matches = []
+        for candidate in self._vocabulary[start:start + PREFIX_EXPANSIONS + 1]:
+            if not candidate.startswith(term):
+                break
+            if candidate != term:
+                matches.append(candidate)
+        return matches
+
+    def search(self, query, limit=15, offset=0):
+        """(total matches, [(block index, score), ...] for the requested page), best first."""
+        terms = tokenize(query)
+        if not terms:
+            return 0, []
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return 0, []
+            avg_length = self._total_length / n
+            weighted_terms = [(t, 1.0) for t in dict.fromkeys(terms)]
+            weighted_terms += [(t, PREFIX_WEIGHT) for t in self._expand(terms[-1])]
+            scores = {}
+            for term, query_weight in weighted_terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings:
+                    length = self.docs[doc_id][1]
+                    norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_length))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + query_weight * idf * norm
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+            page = ranked[offset:offset + limit]
+            return len(ranked), [(self.docs[doc_id][0], round(score, 4)) for doc_id, score in page]
+
+
+def article_fields(data, metadata):
+    """Searchable text of an article: its metadata document, falling back to the block's own copy."""
+    metadata = metadata if isinstance(metadata, dict) else {}
+    return {
+        "title": metadata.get("title") or data.get("title"),
+        "description": metadata.get("description") or data.get("excerpt"),
+        "category": metadata.get("category") or data.get("category"),
+        "source": metadata.get("source") or data.get("source")
+    }
+
+
+def index_upload(block_index, data, metadata):
+    """Index an article upload_news just mined, from the metadata it already holds."""
+    if SEARCH_INDEXING:
+        get_search_indexer().index.add(block_index, article_fields(data, metadata))
+
+
+class SearchIndexer:
+    """
+    Keeps a SearchIndex current: backfills article blocks past the index's
+    last_index from the chain, then indexes new blocks as the manager reports
+    them. Metadata comes from the local metadata cache (fetched through the
+    gateways only on a miss).
+    """
+
+    def __init__(self, manager, index=None, metadata_cache=None):
+        self.manager = manager
+        self.index = index or SearchIndex()
+        self.metadata_cache = metadata_cache or get_metadata_cache()
+        self._queue = queue.Queue()
+        self.backfilling = True
+
+    def start(self):
+        self.manager.add_listener(self._on_blocks)
+        threading.Thread(target=self._run, name="search-indexer", daemon=True).start()
+        return self
+
+    def _on_blocks(self, blocks):
+        # runs inside the manager's commit, so only queue work here
+        for block in blocks:
+            self._queue.put((block.get("index"), block_data(block)))
+
+    def _index(self, block_index, data):
+        if not data.get("metadata_hash"):
+            self.index.mark_seen(block_index)
+            return
+        if block_index in self.index:
+            return  # upload_news indexed it already
+        metadata = self.metadata_cache.fetch(data["metadata_hash"], data.get("ipfs_url"))
+        self.index.add(block_index, article_fields(data, metadata))
+
+    def _run(self):
+        try:
+            chain = self.manager.chain
+            if self.index.last_index > len(chain):
+                logger.warning("Search index is ahead of the chain (rewritten?), rebuilding it")
+                self.index.clear()
+            for pos in range(min(self.index.last_index, len(chain)), len(chain)):
+                block = chain[pos]
+                self._index(block["index"], block_data(block))
+                if self.index.needs_save(SAVE_EVERY):
+                    self.index.save()
+        except Exception as e:
+            logger.warning("Search index backfill stopped: %s", e)
+        self.backfilling = False
+        self.index.save()
+        while True:
+            block_index, data = self._queue.get()
+            try:
+                self._index(block_index, data)
+            except Exception as e:
+                logger.warning("Could not index block %s: %s", block_index, e)
+            if self._queue.empty() and self.index.needs_save():
+                self.index.save()
+
+
+_indexer = None
+_indexer_lock = threading.Lock()
+
+
+def start_search_indexer():
+    """Start the shared indexer in the background, so the backfill runs before the first search."""
+    def _start():
+        try:
+            get_search_indexer()
+        except Exception as e:
+            logger.warning("Could not start the search indexer: %s", e)
+
+    threading.Thread(target=_start, name="search-indexer-start", daemon=True).start()
+
+
+def get_search_indexer():
+    """The shared indexer, started (load, backfill, listen) on first use."""
+    global _indexer
+    if _indexer is None:
+        with _indexer_lock:
+            if _indexer is None:
+                from app.blockchain_manager import get_manager
+                _indexer = SearchIndexer(get_manager()).start()
+    return _indexer
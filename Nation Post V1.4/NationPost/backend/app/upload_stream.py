@@ -0,0 +1,114 @@
+import hashlib
+import io
+import os
+import uuid
+from tempfile import SpooledTemporaryFile
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.dedup_index import file_sha256
+
+# ---------------------------
+# Streamed uploads
+# ---------------------------
+# Werkzeug parses multipart bodies in small chunks and writes each file part to
+# whatever Request._get_file_stream returns. UploadRequest hands it a HashingSpool:
+# kept in memory up to UPLOAD_SPOOL_BYTES then spilled to a temp file, hashed as
+# the bytes arrive, and refusing (413) a part that grows past UPLOAD_MAX_FILE_BYTES
+# the moment it does. UPLOAD_MAX_BYTES caps the whole request before it is read.
+#
+# On the way out, MultipartBody streams a spooled file to Pinata as a multipart
+# body read in chunks (requests' files= builds the whole body in memory first).
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(512 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+
+
+class HashingSpool(SpooledTemporaryFile):
+    """Spooled temp file that keeps a running SHA-256 and size of what is written to it."""
+
+    def __init__(self, max_bytes=UPLOAD_MAX_FILE_BYTES, spool_bytes=UPLOAD_SPOOL_BYTES):
+        super().__init__(max_size=spool_bytes, mode="w+b")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f"Each uploaded file may be at most {self.max_bytes} bytes")
+        self._sha256.update(data)
+        return super().write(data)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if content_length is not None and content_length > UPLOAD_MAX_FILE_BYTES:
+            raise RequestEntityTooLarge(f"Each uploaded file may be at most {UPLOAD_MAX_FILE_BYTES} bytes")
+        return HashingSpool()
+
+
+def init_app(app):
+    app.request_class = UploadRequest
+    if app.config.get("MAX_CONTENT_LENGTH") is None:
+        app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES
+
+
+def stream_sha256(stream):
+    """SHA-256 of an uploaded file: taken while spooling, or by reading it back if it wasn't spooled here."""
+    if isinstance(stream, HashingSpool):
+        return stream.sha256
+    return file_sha256(stream)
+
+
+def stream_size(stream):
+    """Bytes in a seekable stream, which is left rewound."""
+    if isinstance(stream, HashingSpool):
+        stream.seek(0)
+        return stream.size
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+class MultipartBody:
+    """
+    multipart/form-data body (text fields, then one file) readable in chunks; its
+    len() lets requests send a Content-Length instead of chunked encoding.
+    """
+
+    def __init__(self, fields, name, filename, stream, content_type):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode()
+            for key, value in fields.items()
+        )
+        head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                 f'filename="{_quote(filename)}"\r\n'
+                 f'Content-Type: {content_type or "application/octet-stream"}\r\n\r\n').encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self._length = len(head) + stream_size(stream) + len(tail)
+        self._parts = [io.BytesIO(head), stream, io.BytesIO(tail)]
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=CHUNK_SIZE):
+        if size is None or size < 0:
+            size = CHUNK_SIZE
+        while self._parts:
+            chunk = self._parts[0].read(size)
+            if chunk:
+                return chunk
+            self._parts.pop(0)
+        return b""
+
+
+def _quote(filename):
+    return (filename or "file").replace("\\", "\\\\").replace('"', '\\"').replace("\r", "").replace("\n", "")
@@ -0,0 +1,38 @@
+"""
+Async serving mode:
+
+    uvicorn asgi:create_asgi_app --factory --host 0.0.0.0 --port 5000 --workers 4
+    python asgi.py
+
+Requests are accepted on uvicorn's event loop and handed to the Flask app in a
+pool of ASGI_WSGI_THREADS threads; the views' outbound I/O fans out on the shared
+loop in app.aio, and proof-of-work and bcrypt run in executors (ASYNC_MODE=1).
+Requests that stay open (the SSE feed, long-polls) wait on uvicorn's loop
+instead of in that pool; see app.asgi_routes.
+Needs uvicorn and a2wsgi installed (see requirements.txt).
+
+The app is built by a factory, not at import time, because the proof-of-work
+worker processes import the main module when they start.
+"""
+import os
+
+os.environ.setdefault("ASYNC_MODE", "1")
+
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "64"))
+
+
+def create_asgi_app():
+    try:
+        from a2wsgi import WSGIMiddleware
+    except ImportError as e:
+        # no fallback: asgiref's adapter runs every WSGI request on one shared thread
+        raise ImportError("Async serving needs a2wsgi: pip install a2wsgi uvicorn") from e
+    from app import create_app
+    from app.asgi_routes import AsyncRoutes
+    return AsyncRoutes(WSGIMiddleware(create_app(), workers=ASGI_WSGI_THREADS))
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("asgi:create_asgi_app", factory=True,
+                host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "5000")))
@@ -0,0 +1,250 @@
+"""
+Benchmarks for the chain, dashboard and upload hot paths.
+
+Run from the backend directory:
+
+    python -m benchmarks.run                         # 1k, 10k and 100k block chains
+    python -m benchmarks.run --sizes 1000,1000000 --only validate,hash_lookup
+    python -m benchmarks.run compare results/a.json results/b.json
+
+Every external service (Pinata, IPFS gateways, Google News, Gemini, MongoDB) is
+replaced by a local stand-in, so numbers only reflect this codebase. Results are
+written as JSON to benchmarks/results/<commit>-<timestamp>.json.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+DEFAULT_SIZES = [1000, 10000, 100000]
+BENCHMARKS = ["mining", "save", "load", "validate", "hash_lookup", "dashboard_list", "upload"]
+
+
+# ---------------------------
+# Timing helpers
+# ---------------------------
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def measure(name, size, fn, iterations):
+    """Call fn() `iterations` times and summarise per-call latency and throughput."""
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "name": name,
+        "size": size,
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / total, 3) if total else None,
+        "mean_ms": round(total / iterations * 1000, 3),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3)
+    }
+    print(f"  {name:<21} size={size:<8} {result['ops_per_sec']:>10} ops/s  "
+          f"p50={result['p50_ms']} ms  p99={result['p99_ms']} ms", flush=True)
+    return result
+
+
+def _iterations(size, budget):
+    """Fewer iterations for big chains so a full run stays in minutes, never below 3."""
+    return max(3, min(budget, (budget * 1000) // max(size, 1)))
+
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+def run_size(size, only, seed):
+    from app import blockchain_manager
+    from app.blockchain_manager import BlockchainManager
+    from benchmarks.synthetic import build_chain
+
+    manager = BlockchainManager()
+    print(f"building synthetic chain of {size} blocks...", flush=True)
+    manager.chain = build_chain(size, manager.seal_block, seed=seed)
+    manager._save_chain()
+    # let any background sealing finish so loads measure the steady state
+    while getattr(manager, "_sealing", False):
+        time.sleep(0.05)
+    manager.reload()
+    blockchain_manager._manager = manager
+
+    rng = random.Random(seed)
+    results = []
+
+    if "mining" in only:
+        proofs = [rng.randint(1, 200000) for _ in range(20)]
+        results.append(measure("mining", size, lambda i: manager.proof_of_work(proofs[i % len(proofs)]), 20))
+
+    if "save" in only:
+        results.append(measure("save", size, lambda i: manager._save_chain(), _iterations(size, 10)))
+
+    if "load" in only:
+        results.append(measure("load", size, lambda i: manager._load_chain(), _iterations(size, 10)))
+
+    if "validate" in only:
+        results.append(measure("validate", size, lambda i: manager.is_chain_valid(), _iterations(size, 10)))
+
+    client = _client() if {"hash_lookup", "dashboard_list", "upload"} & set(only) else None
+
+    if "hash_lookup" in only:
+        hashes = [manager.chain[rng.randrange(len(manager.chain))]["hash"] for _ in range(50)]
+
+        def lookup(i):
+            r = client.get(f"/blockchain/verify/{hashes[i % len(hashes)]}")
+            assert r.status_code == 200, r.status_code
+
+        results.append(measure("hash_lookup", size, lookup, _iterations(size, 20)))
+
+    if "dashboard_list" in only:
+        from app import http_cache
+
+        def dashboard_list(i):
+            # building the cards, not serving them from the tip cache (timed separately below)
+            http_cache._cache.clear()
+            r = client.get("/dashboard/list?limit=15")
+            assert r.status_code == 200, r.status_code
+
+        def dashboard_list_cached(i):
+            r = client.get("/dashboard/list?limit=15")
+            assert r.status_code == 200, r.status_code
+
+        results.append(measure("dashboard_list", size, dashboard_list, _iterations(size, 20)))
+        results.append(measure("dashboard_list_cached", size, dashboard_list_cached, _iterations(size, 20)))
+
+    if "upload" in only:
+        def upload(i):
+            r = client.post("/upload/", data={
+                "title": f"Budget session opens {i}",
+                "category": "politics",
+                "source": "bench",
+                "description": "Budget session opens with rally over trade policy " * 5,
+                "userID": "user-1",
+                "files": (io.BytesIO(os.urandom(64 * 1024)), f"photo-{i}.jpg", "image/jpeg")
+            }, content_type="multipart/form-data")
+            assert r.status_code == 201, r.get_data(as_text=True)
+
+        results.append(measure("upload", size, upload, _iterations(size, 5)))
+
+    return results
+
+
+_app_client = None
+
+
+def _client():
+    global _app_client
+    if _app_client is None:
+        from app import create_app
+        _app_client = create_app().test_client()
+    return _app_client
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def run(args):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    # background cache warming and search indexing would compete with the timed sections
+    os.environ.setdefault("CACHE_WARMING", "0")
+    os.environ.setdefault("SEARCH_INDEXING", "0")
+    # the Gemini stand-in is local, so don't throttle it like the real API
+    os.environ.setdefault("GEMINI_RPM", "600000")
+    os.environ.setdefault("GEMINI_BURST", "1000")
+    from benchmarks.stubs import StubServer, install_app_stubs
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = args.only.split(",") if args.only else BENCHMARKS
+    stub = StubServer().start()
+    install_app_stubs(users=[{"userID": "user-1", "name": "User 1", "email": "bench@example.com"}])
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="nationpost-bench-")
+    cwd = os.getcwd()
+    try:
+        # BlockchainManager keeps its chain under ./data, so run inside a scratch directory
+        os.chdir(workdir)
+        for size in sizes:
+            results.extend(run_size(size, only, args.seed))
+    finally:
+        os.chdir(cwd)
+        stub.stop()
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "sizes": sizes
+        },
+        "results": results
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+
+
+def compare(args):
+    """Print the throughput ratio (new / old) of every benchmark present in both files."""
+    with open(args.old) as f:
+        old = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    with open(args.new) as f:
+        new = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"{'benchmark':<16} {'size':>8} {'old ops/s':>12} {'new ops/s':>12} {'ratio':>7}")
+    for key in sorted(old.keys() & new.keys()):
+        o, n = old[key]["ops_per_sec"], new[key]["ops_per_sec"]
+        ratio = n / o if o else float("nan")
+        print(f"{key[0]:<16} {key[1]:>8} {o:>12} {n:>12} {ratio:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NationPost backend benchmarks")
+    sub = parser.add_subparsers(dest="command")
+    cmp_parser = sub.add_parser("compare", help="compare two result files")
+    cmp_parser.add_argument("old")
+    cmp_parser.add_argument("new")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated chain sizes (1000 up to 1000000)")
+    parser.add_argument("--only", default="", help=f"comma separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default="", help="result file (default benchmarks/results/<commit>-<time>.json)")
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        compare(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import requests
+from benchmarks.synthetic import article_metadata
+
+# ---------------------------
+# Local stand-ins for Pinata, the IPFS gateways, Google News, Gemini and MongoDB
+# ---------------------------
+# Outbound requests to the real hosts, over requests or httpx (app.aio's shared
+# client), are rewritten to a local HTTP server so the app code under test runs
+# unmodified, just without the network.
+STUB_HOSTS = {
+    "api.pinata.cloud",
+    "gateway.pinata.cloud",
+    "ipfs.io",
+    "dweb.link",
+    "news.google.com",
+}
+# Requests to http://127.0.0.1:<port>/<DOWN_HOST>/... always fail, to stand in for a dead gateway
+DOWN_HOST = "down.invalid"
+
+RSS_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>bench</title>
+<item><title>Budget session opens with rally over trade policy</title><link>https://example.com/1</link>
+<pubDate>{date}</pubDate></item>
+<item><title>Monsoon storm hits rail and energy supply</title><link>https://example.com/2</link>
+<pubDate>{date}</pubDate></item>
+</channel></rss>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "NationPostStub/1.0"
+    pins = {}
+    pins_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _split(self):
+        # path is /<original host>/<original path>
+        host, _, rest = self.path.lstrip("/").partition("/")
+        return host, "/" + rest
+
+    def do_GET(self):
+        host, path = self._split()
+        if host == DOWN_HOST:
+            return self._send(502, {"error": "bad gateway"})
+        if host == "news.google.com":
+            from email.utils import formatdate
+            return self._send(200, RSS_FEED.format(date=formatdate(usegmt=True)), "application/rss+xml")
+        if path.startswith("/ipfs/"):
+            cid = path[len("/ipfs/"):].split("?", 1)[0]
+            with self.pins_lock:
+                doc = self.pins.get(cid)
+            return self._send(200, doc if doc is not None else article_metadata(cid))
+        return self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        host, path = self._split()
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        cid = "Qm" + hashlib.sha256(body).hexdigest()[:44]
+        if path == "/pinning/pinJSONToIPFS":
+            try:
+                doc = json.loads(body).get("pinataContent")
+            except Exception:
+                doc = None
+            with self.pins_lock:
+                self.pins[cid] = doc
+        if path.startswith("/pinning/"):
+            return self._send(200, {"IpfsHash": cid, "PinSize": len(body), "Timestamp": "2025-01-01T00:00:00Z"})
+        return self._send(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        return self._send(200, "OK", "text/plain")
+
+
+class StubServer:
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._original_request = None
+        self._original_httpx_send = None
+
+    def start(self):
+        self._thread.start()
+        self._patch_requests()
+        return self
+
+    def gateway_url(self, host="ipfs.io"):
+        """Base URL for IPFS_GATEWAYS that reaches this server directly, without the requests patch."""
+        return f"http://127.0.0.1:{self.port}/{host}"
+
+    def stop(self):
+        if self._original_request is not None:
+            requests.sessions.Session.request = self._original_request
+        if self._original_httpx_send is not None:
+            import httpx
+            httpx.AsyncClient.send = self._original_httpx_send
+        self.httpd.shutdown()
+
+    def _stub_url(self, url):
+        """`url` pointed at this server if it is for one of STUB_HOSTS, else None."""
+        parts = urlsplit(url)
+        if parts.hostname not in STUB_HOSTS:
+            return None
+        url = f"http://127.0.0.1:{self.port}/{parts.hostname}{parts.path}"
+        if parts.query:
+            url += "?" + parts.query
+        return url
+
+    def _patch_requests(self):
+        original = requests.sessions.Session.request
+        stub_url = self._stub_url
+
+        def request(session, method, url, *args, **kwargs):
+            return original(session, method, stub_url(url) or url, *args, **kwargs)
+
+        self._original_request = original
+        requests.sessions.Session.request = request
+
+        try:
+            import httpx
+        except ImportError:  # app.aio falls back to requests, patched above
+            return
+        original_send = httpx.AsyncClient.send
+
+        async def send(client, request, *args, **kwargs):
+            url = stub_url(str(request.url))
+            if url is not None:
+                request.url = httpx.URL(url)
+                request.headers["Host"] = request.url.netloc.decode("ascii")
+            return await original_send(client, request, *args, **kwargs)
+
+        self._original_httpx_send = original_send
+        httpx.AsyncClient.send = send
+
+
+VERDICT = '{"prediction": "REAL", "confidence": "75", "reason": "bench stand-in"}'
+
+
+class FakeGeminiResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt, request_options=None):
+        # batched prompts (see app.llm_gateway.batch_prompt) get one verdict per claim
+        claims = prompt.count("Claim ")
+        if "JSON array" in prompt and claims:
+            return FakeGeminiResponse("[" + ",".join([VERDICT] * claims) + "]")
+        return FakeGeminiResponse(VERDICT)
+
+
+class FakeGenai:
+    GenerativeModel = FakeGenerativeModel
+
+
+class FakeCollection:
+    """In-memory users collection supporting the find_one/insert_one calls the routes make."""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+
+    def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                if projection:
+                    return {k: v for k, v in doc.items() if projection.get(k, 1) and k != "_id"}
+                return dict(doc)
+        return None
+
+    def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+
+class FakeMongoClient:
+    def __init__(self, users):
+        self.authDB = type("DB", (), {"users": users})()
+
+
+def install_app_stubs(users=()):
+    """Point the app's lazy Gemini and Mongo slots at the stand-ins."""
+    from app import db
+    from app import llm_gateway
+    db._client = FakeMongoClient(FakeCollection(users))
+    llm_gateway._genai = FakeGenai()
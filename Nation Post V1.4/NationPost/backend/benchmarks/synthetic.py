@@ -0,0 +1,73 @@
+import hashlib
+import random
+
+# ---------------------------
+# Synthetic chains
+# ---------------------------
+# Blocks look like the ones upload_news mines (same data keys, real hash links) but
+# skip proof-of-work, so a 1M block chain can be generated in seconds.
+CATEGORIES = ["politics", "sports", "technology", "business", "health", "world"]
+WORDS = ("india election budget market cricket vaccine climate court policy startup "
+         "minister rally storm energy school rail monsoon trade summit").split()
+
+
+def fake_cid(seed):
+    return "Qm" + hashlib.sha256(str(seed).encode()).hexdigest()[:44]
+
+
+def article_data(i, rng):
+    title = " ".join(rng.choice(WORDS) for _ in range(8)).capitalize()
+    cid = fake_cid(f"meta-{i}")
+    return {
+        "title": title,
+        "category": rng.choice(CATEGORIES),
+        "source": "bench",
+        "metadata_hash": cid,
+        "ipfs_url": f"https://gateway.pinata.cloud/ipfs/{cid}",
+        "content_hash": hashlib.sha256(cid.encode()).hexdigest(),
+        "timestamp": f"2025-01-01 00:00:{i % 60:02d}.000000",
+        "uploaded_by": {"userID": f"user-{i % 97}", "name": f"User {i % 97}"},
+        "excerpt": " ".join(rng.choice(WORDS) for _ in range(20)) + "...",
+        "thumbnail": fake_cid(f"img-{i}"),
+        "reliability": round(rng.random() * 10, 1)
+    }
+
+
+def article_metadata(cid):
+    """Deterministic metadata document for the gateway stand-in to serve for any CID."""
+    rng = random.Random(cid)
+    title = " ".join(rng.choice(WORDS) for _ in range(8)).capitalize()
+    return {
+        "title": title,
+        "category": rng.choice(CATEGORIES),
+        "source": "bench",
+        "description": " ".join(rng.choice(WORDS) for _ in range(120)),
+        "files": [{"filename": "a.jpg", "ipfsHash": fake_cid(cid + "-img"), "pin_name": f"{title} - image 1"}],
+        "verification": {"prediction": "REAL", "confidence": 80, "score": 8.0, "reason": "bench", "sources": []},
+        "uploaded_by": {"userID": "user-1", "name": "User 1"},
+        "published_at": "2025-01-01T00:00:00"
+    }
+
+
+def build_chain(n_blocks, seal_block, seed=1234):
+    """Return a linked chain of `n_blocks` blocks sealed (version, digest, hash) with the manager's `seal_block`."""
+    rng = random.Random(seed)
+    genesis = {
+        "index": 1,
+        "timestamp": 1700000000.0,
+        "data": {"message": "Genesis Block"},
+        "previous_hash": "0",
+        "proof": 1
+    }
+    chain = [seal_block(genesis)]
+    for i in range(2, n_blocks + 1):
+        block = {
+            "index": i,
+            "timestamp": 1700000000.0 + i,
+            "data": article_data(i, rng),
+            "previous_hash": chain[-1]["hash"],
+            "proof": rng.randint(1, 200000)
+        }
+        chain.append(seal_block(block))
+    return chain
+
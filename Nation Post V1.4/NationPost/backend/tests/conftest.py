@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# read at import time by the app modules, so set before any of them is imported
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("CACHE_WARMING", "0")
+os.environ.setdefault("SEARCH_INDEXING", "0")
+os.environ.setdefault("GEMINI_RPM", "600000")
+os.environ.setdefault("GEMINI_BURST", "1000")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in a scratch directory (the app keeps its state under ./data) with fresh singletons."""
+    from app import blockchain_manager, dedup_index, gateway_client, http_cache, media_cache, metadata_cache
+    from app.routes import dashboard
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(blockchain_manager, "_manager", None)
+    monkeypatch.setattr(dedup_index, "_index", None)
+    monkeypatch.setattr(gateway_client, "_client", None)
+    monkeypatch.setattr(metadata_cache, "_cache", None)
+    monkeypatch.setattr(media_cache, "_cache", None)
+    monkeypatch.setattr(media_cache, "_chain_media", None)
+    monkeypatch.setattr(http_cache, "_cache", http_cache.PayloadCache())
+    monkeypatch.setattr(dashboard, "_watcher", None)
+    return tmp_path
+
+
+@pytest.fixture
+def client(workdir):
+    from app import create_app
+    return create_app().test_client()
+
+
+@pytest.fixture
+def services(workdir):
+    """Pinata, the IPFS gateways, Google News, Gemini and MongoDB replaced by the benchmark stand-ins."""
+    from benchmarks.stubs import StubServer, install_app_stubs
+    from app import db, llm_gateway
+
+    stub = StubServer().start()
+    saved = db._client, llm_gateway._genai, llm_gateway._gateway
+    install_app_stubs(users=[{"userID": "user-1", "name": "User 1", "email": "test@example.com"}])
+    yield stub
+    stub.stop()
+    db._client, llm_gateway._genai, llm_gateway._gateway = saved
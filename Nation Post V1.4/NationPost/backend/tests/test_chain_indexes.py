@@ -0,0 +1,40 @@
+from app.blockchain_manager import BlockchainManager
+
+ARTICLE = {"metadata_hash": "Qm" + "A" * 44, "uploaded_by": {"userID": "u1"}}
+
+
+def test_author_and_category_feeds_newest_first(client):
+    manager = BlockchainManager()
+    for i in range(3):
+        manager.add_block(dict(ARTICLE, title=f"story {i}", category=" Politics "))
+    manager.add_block(dict(ARTICLE, title="other", category="sport", uploaded_by={"userID": "u2"}))
+
+    r = client.get("/dashboard/by-user/u1?limit=2")
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["total"] == 3
+    assert [item["title"] for item in body["items"]] == ["story 2", "story 1"]
+
+    r = client.get("/dashboard/by-category/POLITICS?offset=2")
+    assert [item["title"] for item in r.get_json()["items"]] == ["story 0"]
+    assert client.get("/dashboard/by-user/nobody").get_json()["total"] == 0
+
+
+def test_mine_rejects_a_body_that_is_not_an_object(client):
+    for body in (["a", "b"], "text", 3):
+        assert client.post("/blockchain/mine", json=body).status_code == 400
+    assert client.post("/blockchain/mine", data="not json").status_code == 400
+    assert client.post("/blockchain/mine", json={"title": "ok"}).status_code == 201
+    assert len(client.get("/blockchain/chain").get_json()) == 2
+
+
+def test_a_block_with_non_object_data_does_not_break_loading(client):
+    manager = BlockchainManager()
+    manager.add_block(["a", "b"])
+    manager.add_block(dict(ARTICLE, title="after", category="x"))
+
+    reloaded = BlockchainManager()
+    assert len(reloaded.chain) == 3
+    assert reloaded.user_index == {"u1": [2]}
+    for url in ("/blockchain/chain", "/dashboard/by-user/u1", "/dashboard/by-category/x"):
+        assert client.get(url).status_code == 200
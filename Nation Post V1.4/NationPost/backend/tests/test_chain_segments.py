@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+import pytest
+
+from app import blockchain_manager, chain_segments
+from app.blockchain_manager import BlockchainManager
+
+SEGMENT_BLOCKS = 5
+
+
+@pytest.fixture
+def sealed(workdir, monkeypatch):
+    """A 12-block chain whose first 10 blocks are sealed into two segments."""
+    monkeypatch.setattr(blockchain_manager, "SEGMENT_BLOCKS", SEGMENT_BLOCKS)
+    monkeypatch.setattr(chain_segments, "SEGMENT_BLOCKS", SEGMENT_BLOCKS)
+    manager = BlockchainManager()
+    for i in range(11):
+        manager.add_block({"title": f"story{i:02d}", "metadata_hash": f"Qm{i}",
+                           "uploaded_by": {"userID": "u1"}, "category": "news"})
+        wait_for_sealing(manager)
+    return manager
+
+
+def wait_for_sealing(manager):
+    while manager._sealing:
+        time.sleep(0.01)
+
+
+def test_reload_serves_sealed_blocks_and_parses_only_the_tail(sealed):
+    assert sealed.chain.base_count == 10
+
+    reloaded = BlockchainManager()
+    assert reloaded.chain.base_count == 10
+    assert len(reloaded.chain.indexes) == 2
+    assert [b["hash"] for b in reloaded.chain] == [b["hash"] for b in sealed.chain]
+    assert reloaded.chain[3]["data"]["title"] == "story02"
+    assert reloaded.chain.find(sealed.chain[4]["hash"]) == 4
+    assert reloaded.user_index == sealed.user_index
+    assert [b["index"] for b in reloaded.blocks_between(8, 11)] == [9, 10, 11]
+    assert reloaded.is_chain_valid()
+
+
+def test_a_same_length_edit_to_a_sealed_line_fails_deep_validation(sealed):
+    with open(sealed.file_path, "rb") as f:
+        raw = f.read()
+    with open(sealed.file_path, "wb") as f:
+        f.write(raw.replace(b"story02", b"STORY02"))
+
+    reloaded = BlockchainManager()
+    assert reloaded.chain.base_count == 10  # loading only checks the last sealed block
+    assert not reloaded.is_chain_valid(deep=True)
+    assert reloaded.is_chain_valid(deep=False)
+
+
+def _flip_a_hash_bit(manager, segment_file):
+    # inside block 2's hash in the segment's record table
+    with open(os.path.join(manager.segments_dir, segment_file), "r+b") as f:
+        f.seek(chain_segments.HEADER.size + 2 * chain_segments.RECORD.size + 40)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 1]))
+
+
+def test_a_corrupt_segment_fails_validation(sealed):
+    _flip_a_hash_bit(sealed, "seg-000000000000.npseg")
+    assert not BlockchainManager().is_chain_valid()
+
+
+def test_a_corrupt_last_segment_is_rebuilt_from_the_chain_file(sealed):
+    # the last segment is opened on load to check it against the file
+    _flip_a_hash_bit(sealed, "seg-000000000005.npseg")
+    reloaded = BlockchainManager()
+    assert reloaded.chain.base_count == 0
+    assert reloaded.is_chain_valid()
+
+
+def test_rewriting_the_chain_keeps_the_sealed_ranges_valid(sealed):
+    sealed._save_chain()
+    wait_for_sealing(sealed)
+    assert sealed.chain.base_count == 10
+    assert sealed.is_chain_valid()
+
+
+def test_segments_without_chain_file_digests_are_resealed(sealed):
+    manifest_path = os.path.join(sealed.segments_dir, chain_segments.MANIFEST)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    for entry in manifest["segments"]:
+        del entry["log"], entry["log_digest"]
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    wait_for_sealing(BlockchainManager())
+    reloaded = BlockchainManager()
+    assert reloaded.chain.base_count == 10
+    assert reloaded.chain.base.has_log_digests()
+    assert reloaded.is_chain_valid()
@@ -0,0 +1,99 @@
+import io
+import threading
+
+from app.dedup_index import DedupIndex, article_fingerprint, simhash
+
+STORY = ("The city council voted on Tuesday to expand the bus network to the northern "
+         "suburbs, adding four new routes and extending evening service until midnight "
+         "after months of complaints from commuters about overcrowding. The transport "
+         "department said the first two routes will open in the spring, with the rest "
+         "following once new drivers have been hired and trained. Fares will stay "
+         "the same for the rest of the year.")
+REWORDED = ("The city council voted on Tuesday to expand the bus network to the northern "
+            "suburbs, adding four new routes and extending evening service until midnight "
+            "after months of complaints from riders about overcrowding. The transport "
+            "department said the first two routes will open in the spring, with the rest "
+            "following once new drivers have been hired and trained. Fares will stay "
+            "the same for the rest of the year.")
+UNRELATED = ("Heavy rain is expected across the coast this weekend, and forecasters warn "
+             "of flooding in low-lying areas along the river delta.")
+
+
+def test_exact_fingerprint_ignores_case_whitespace_and_punctuation():
+    a = article_fingerprint("Bus Routes Expand!", "New routes.", "Local", "Council", ["f1", "f2"])
+    b = article_fingerprint("  bus routes   expand", "new ROUTES", "local", "council.", ["f2", "f1"])
+    assert a == b
+    assert a != article_fingerprint("Bus Routes Expand!", "New routes.", "Local", "Council", ["f1"])
+    assert a != article_fingerprint("Bus Routes Shrink", "New routes.", "Local", "Council", ["f1", "f2"])
+
+
+def test_near_matches_a_reworded_article_but_not_an_unrelated_one(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.json"))
+    article = {"metadata_hash": "QmStory"}
+    index.record("fp-story", simhash(STORY), article, {"sha-1": "QmFile"})
+
+    match = index.near(simhash(REWORDED))
+    assert match is not None
+    assert match[0] == article
+    assert 0 < match[1] <= 6
+    assert index.near(simhash(UNRELATED)) is None
+    assert index.near(simhash("")) is None
+    assert index.exact("fp-story") == article
+    assert index.exact("fp-other") is None
+
+
+def test_the_index_is_shared_through_its_file(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    first, second = DedupIndex(path), DedupIndex(path)
+    second.exact("fp-story")  # loaded before the first one writes
+
+    first.record("fp-story", simhash(STORY), {"metadata_hash": "QmStory"}, {"sha-1": "QmFile"})
+
+    assert second.exact("fp-story") == {"metadata_hash": "QmStory"}
+    assert second.known_file("sha-1") == "QmFile"
+    assert second.near(simhash(REWORDED))[0] == {"metadata_hash": "QmStory"}
+    assert DedupIndex(path).known_file("sha-1") == "QmFile"
+
+
+def test_uploading_serialises_one_fingerprint_and_drops_the_entry_after(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.json"))
+    order = []
+    index.uploading("fp")
+
+    def second_upload():
+        index.uploading("fp")
+        order.append("second")
+        index.done("fp")
+
+    thread = threading.Thread(target=second_upload)
+    thread.start()
+    thread.join(0.2)
+    assert order == []  # still waiting for the first upload
+    order.append("first")
+    index.done("fp")
+    thread.join(5)
+
+    assert order == ["first", "second"]
+    assert index._pending == {}
+
+
+def _upload(client, description, photo=b"photo bytes", **fields):
+    data = dict({"title": "Bus routes expand", "category": "local", "source": "council",
+                 "description": description, "userID": "user-1",
+                 "files": (io.BytesIO(photo), "photo.jpg", "image/jpeg")}, **fields)
+    return client.post("/upload/", data=data, content_type="multipart/form-data")
+
+
+def test_uploads_of_the_same_article_are_mined_once(client, services):
+    first = _upload(client, STORY)
+    assert first.status_code == 201, first.get_data(as_text=True)
+
+    again = _upload(client, STORY, title="  BUS ROUTES EXPAND! ")
+    assert again.status_code == 200
+    assert again.get_json()["duplicate"] is True
+    assert len(client.get("/blockchain/chain").get_json()) == 2
+
+    near = _upload(client, REWORDED, photo=b"another photo")
+    assert near.status_code == 201
+    assert near.get_json()["near_duplicate_of"]["block_index"] == first.get_json()["block_index"]
+    assert len(client.get("/blockchain/chain").get_json()) == 3
@@ -0,0 +1,54 @@
+import gzip
+
+from app.blockchain_manager import BlockchainManager
+
+
+def test_chain_reads_revalidate_to_304_until_the_tip_moves(client):
+    manager = BlockchainManager()
+    manager.add_block({"title": "first"})
+
+    r = client.get("/blockchain/chain")
+    etag = r.headers["ETag"]
+    assert r.status_code == 200
+    assert r.headers["Cache-Control"] == "no-cache"
+    assert r.headers["Vary"] == "Accept-Encoding"
+
+    r = client.get("/blockchain/chain", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["ETag"] == etag
+    assert r.get_data() == b""
+    assert client.get("/blockchain/chain", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    manager.add_block({"title": "second"})
+    r = client.get("/blockchain/chain", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    assert [b["data"].get("title") for b in r.get_json()[1:]] == ["first", "second"]
+
+
+def test_etags_differ_per_query(client):
+    BlockchainManager().add_block({"title": "first", "category": "news"})
+    a = client.get("/dashboard/list?limit=1").headers["ETag"]
+    b = client.get("/dashboard/list?limit=2").headers["ETag"]
+    assert a != b
+    assert client.get("/dashboard/list?limit=2", headers={"If-None-Match": a}).status_code == 200
+
+
+def test_large_bodies_are_compressed_when_accepted(client):
+    manager = BlockchainManager()
+    for i in range(10):
+        manager.add_block({"title": f"story {i}", "description": "x" * 200})
+
+    plain = client.get("/blockchain/chain")
+    assert "Content-Encoding" not in plain.headers
+
+    r = client.get("/blockchain/chain", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(r.get_data()) == plain.get_data()
+    assert r.headers["ETag"] == plain.headers["ETag"]
+
+
+def test_validate_is_never_served_from_the_cache(client):
+    r = client.get("/blockchain/validate")
+    assert r.status_code == 200
+    assert "ETag" not in r.headers
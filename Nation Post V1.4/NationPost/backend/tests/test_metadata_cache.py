@@ -0,0 +1,51 @@
+import os
+
+from app.blockchain_manager import BlockchainManager
+from app.metadata_cache import MetadataCache
+
+CID = "Qm" + "A" * 44
+
+
+class FakeGateway:
+    def __init__(self):
+        self.fetched = []
+
+    def fetch_json(self, cid, ipfs_url=None):
+        self.fetched.append(cid)
+        return {"title": f"doc {cid[-4:]}", "padding": "x" * 500}
+
+    def fetch_json_many(self, items):
+        return [self.fetch_json(cid, url) for cid, url in items]
+
+
+def test_documents_are_fetched_once_and_only_for_cids(tmp_path):
+    gateway = FakeGateway()
+    cache = MetadataCache(root=str(tmp_path), client=gateway)
+
+    assert cache.fetch(CID)["title"] == "doc AAAA"
+    assert MetadataCache(root=str(tmp_path), client=gateway).fetch(CID)["title"] == "doc AAAA"
+    assert gateway.fetched == [CID]
+
+    for key in ("../../etc/passwd", "short", "Qm" + "A" * 40 + "/x"):
+        assert cache.fetch(key) is None
+        cache.put(key, {"title": "nope"})
+    assert gateway.fetched == [CID]
+    assert [name for _, _, names in os.walk(tmp_path) for name in names] == [f"{CID}.json"]
+
+
+def test_the_disk_cache_stays_under_its_size_bound(tmp_path):
+    cache = MetadataCache(root=str(tmp_path), max_bytes=4000, client=FakeGateway())
+    cids = [f"Qm{i:044d}" for i in range(20)]
+    for cid in cids:
+        cache.fetch(cid)
+
+    sizes = [os.path.getsize(os.path.join(d, n)) for d, _, names in os.walk(tmp_path) for n in names]
+    assert sum(sizes) <= 4000
+    assert 0 < len(sizes) < len(cids)
+
+
+def test_article_route_only_serves_metadata_the_chain_refers_to(client):
+    BlockchainManager().add_block({"title": "story", "metadata_hash": CID})
+
+    assert client.get("/dashboard/article/not-a-cid").status_code == 400
+    assert client.get("/dashboard/article/Qm" + "B" * 44).status_code == 404
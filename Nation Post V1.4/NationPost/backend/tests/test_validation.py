@@ -0,0 +1,30 @@
+from app.blockchain_manager import BlockchainManager
+
+
+def test_validate_catches_edited_block_data_unless_fast(client):
+    manager = BlockchainManager()
+    for i in range(3):
+        manager.add_block({"title": f"story{i}", "category": "news"})
+    assert client.get("/blockchain/validate").get_json() == {"valid": True, "deep": True}
+
+    # same length, so the header hashes and links all still line up
+    with open(manager.file_path, "rb") as f:
+        raw = f.read()
+    with open(manager.file_path, "wb") as f:
+        f.write(raw.replace(b"story1", b"STORY1"))
+
+    assert client.get("/blockchain/validate").get_json() == {"valid": False, "deep": True}
+    assert client.get("/blockchain/validate?fast=1").get_json() == {"valid": True, "deep": False}
+
+
+def test_even_fast_validation_catches_an_edited_hash(client):
+    manager = BlockchainManager()
+    manager.add_block({"title": "story"})
+    previous = manager.chain[0]["hash"]
+    with open(manager.file_path, "rb") as f:
+        raw = f.read()
+    with open(manager.file_path, "wb") as f:
+        f.write(raw.replace(previous.encode(), previous[::-1].encode()))
+
+    for url in ("/blockchain/validate", "/blockchain/validate?fast=1"):
+        assert client.get(url).get_json()["valid"] is False
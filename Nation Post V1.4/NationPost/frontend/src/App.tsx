@@ -74,7 +74,7 @@ function AppContent() {
 
         // Map backend metadata JSON to NewsItem
         const thumb = metadata.files && metadata.files.length > 0 ? (metadata.files[0].ipfsHash || '') : (metadata.metadata_hash || '');
-        const thumbnail = thumb && !/^https?:\/\//i.test(String(thumb)) ? `https://gateway.pinata.cloud/ipfs/${thumb}` : String(thumb);
+        const thumbnail = thumb && !/^https?:\/\//i.test(String(thumb)) ? `http://localhost:5000/media/${thumb}` : String(thumb);
 
         const mapped: NewsItem = {
           id: String(metadata.metadata_hash || metadata.block_hash || newsId),
@@ -84,12 +84,13 @@ export async function fetchRemoteNews(): Promise<NewsItem[]> {
     if (!Array.isArray(data)) throw new Error('Unexpected list format');
 
     return data.map((item: any): NewsItem => {
-      // thumbnail value may be an IPFS hash or a full URL; construct full URL when needed
+      // thumbnail value may be an IPFS hash or a full URL; hashes go through the backend's
+      // cached media proxy, which also serves a downscaled copy for the card grid
       const rawThumb = item.thumbnail || item.ipfsHash || item.IpfsHash || (item.files && item.files[0] && (item.files[0].ipfsHash || item.files[0].IpfsHash)) || item.metadata_hash || item.block_hash || '';
       const thumbnail = rawThumb
         ? /^https?:\/\//i.test(String(rawThumb))
           ? String(rawThumb)
-          : `https://emerald-general-ant-906.mypinata.cloud/ipfs/${String(rawThumb)}`
+          : `http://localhost:5000/media/${String(rawThumb)}?w=640`
         : '';
 
       const excerpt = item.description